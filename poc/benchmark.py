@@ -0,0 +1,284 @@
+"""
+Benchmark of the generate -> run -> revise pipeline.
+
+Sends the suites of the benchmark corpus to POST /testcases at a fixed concurrency and reports the latency
+percentiles, the throughput and the time spent in the stages (LLM calls, build, run and extract of the test runs,
+taken from the /metrics of the backend). Without --backend-url the mock OpenAI server and the backend are
+started as subprocesses, the backend talks to the mock, so only the container path and the backend itself are
+measured. The container backend needs a running Docker daemon (or LOCAL_PYTHON_BACKEND_ENABLED=true for Python).
+
+Usage (from the repository root):
+    python poc/benchmark.py --requests 100 --concurrency 8 --languages python --latency-ms 800 --fail-rate 0.2
+    python poc/benchmark.py --backend-url http://127.0.0.1:8000 --requests 50 --output results.json
+Exits with 1 when --max-error-rate or --max-p95-ms is exceeded, to gate deployments.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmark_corpus import get_suites, get_testcases
+
+POC_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(POC_DIR, "..", "src")
+
+# Histograms of the backend whose change during the benchmark is reported, by the label that names the stage
+STAGE_HISTOGRAMS = {
+    "test2code_llm_duration_seconds": "stage",
+    "test2code_container_stage_duration_seconds": "stage",
+}
+ATTEMPTS_HISTOGRAM = "test2code_attempts_per_request"
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise TimeoutError(f"{url} not ready after {timeout} seconds")
+
+
+@contextmanager
+def start_services(args):
+    """
+    Start the mock OpenAI server and the backend pointing at it
+    :return: Context manager yielding the URL of the backend
+    """
+    mock_port, backend_port = get_free_port(), get_free_port()
+    mock_command = [sys.executable, os.path.join(POC_DIR, "mock_openai_server.py"), "--port", str(mock_port),
+                    "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+                    "--fail-rate", str(args.fail_rate), "--seed", str(args.seed)]
+    backend_env = dict(os.environ, OPENAI_BASE_URL=f"http://127.0.0.1:{mock_port}/v1", OPENAI_API_KEY="mock")
+    backend_command = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(backend_port), "--log-level", "warning"]
+
+    processes = []
+    try:
+        processes.append(subprocess.Popen(mock_command, cwd=POC_DIR))
+        wait_until_ready(f"http://127.0.0.1:{mock_port}/docs", processes[-1])
+        processes.append(subprocess.Popen(backend_command, cwd=SRC_DIR, env=backend_env))
+        wait_until_ready(f"http://127.0.0.1:{backend_port}/languages", processes[-1])
+        yield f"http://127.0.0.1:{backend_port}"
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def read_histograms(text: str) -> dict:
+    """
+    Get the buckets, sums and counts of the benchmarked histograms from the Prometheus text format
+    :return: Mapping of (metric, stage) to {"buckets": {le: count}, "sum": s, "count": c}
+    """
+    histograms = defaultdict(lambda: {"buckets": {}, "sum": 0.0, "count": 0.0})
+    for family in text_string_to_metric_families(text):
+        label = STAGE_HISTOGRAMS.get(family.name, "outcome" if family.name == ATTEMPTS_HISTOGRAM else None)
+        if label is None:
+            continue
+        for sample in family.samples:
+            histogram = histograms[(family.name, sample.labels.get(label))]
+            if sample.name.endswith("_bucket"):
+                le = float(sample.labels["le"])
+                histogram["buckets"][le] = histogram["buckets"].get(le, 0) + sample.value
+            elif sample.name.endswith("_sum"):
+                histogram["sum"] += sample.value
+            elif sample.name.endswith("_count"):
+                histogram["count"] += sample.value
+    return histograms
+
+
+def diff_histograms(before: dict, after: dict) -> dict:
+    diff = {}
+    for key, histogram in after.items():
+        previous = before.get(key, {"buckets": {}, "sum": 0.0, "count": 0.0})
+        count = histogram["count"] - previous["count"]
+        if count <= 0:
+            continue
+        diff[key] = {
+            "buckets": {le: value - previous["buckets"].get(le, 0) for le, value in histogram["buckets"].items()},
+            "sum": histogram["sum"] - previous["sum"],
+            "count": count,
+        }
+    return diff
+
+
+def histogram_quantile(histogram: dict, quantile: float) -> float:
+    """
+    Estimate a quantile from cumulative buckets by linear interpolation, like PromQL's histogram_quantile
+    """
+    rank = quantile * histogram["count"]
+    lower_bound, lower_count = 0.0, 0.0
+    for le in sorted(histogram["buckets"]):
+        count = histogram["buckets"][le]
+        if count >= rank:
+            if math.isinf(le):
+                return lower_bound
+            if count == lower_count:
+                return le
+            return lower_bound + (le - lower_bound) * (rank - lower_count) / (count - lower_count)
+        lower_bound, lower_count = le, count
+    return lower_bound
+
+
+def percentile(values: list, quantile: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(quantile * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_load(url: str, suites: list, args) -> list:
+    """
+    Send the requests with at most args.concurrency in flight
+    :return: Latency in seconds, suite name and outcome of every request
+    """
+    semaphore = asyncio.Semaphore(args.concurrency)
+    params = {"use_cache": str(args.use_cache).lower(), "use_execution_cache": str(args.use_cache).lower()}
+    if args.parallel_units:
+        params["parallel_units"] = "true"
+
+    async def send(client, index):
+        suite = suites[index % len(suites)]
+        async with semaphore:
+            start_time = time.time()
+            try:
+                response = await client.post(f"{url}/testcases", params={
+                    **params, "testcases": get_testcases(suite), "language": suite["language"],
+                    "version": suite["version"],
+                })
+                body = response.json()
+                if response.status_code != 200 or not isinstance(body, dict):
+                    outcome = f"http {response.status_code}"
+                elif isinstance(body.get("error"), str):
+                    outcome = body["error"]
+                elif body.get("error", {}).get("type"):
+                    outcome = body["error"]["type"]
+                else:
+                    outcome = "passed"
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            return {"latency": time.time() - start_time, "suite": suite["name"], "outcome": outcome}
+
+    async with httpx.AsyncClient(timeout=args.timeout) as client:
+        return await asyncio.gather(*(send(client, index) for index in range(args.requests)))
+
+
+def build_report(results: list, elapsed: float, stages: dict, args) -> dict:
+    latencies = [result["latency"] for result in results]
+    outcomes = defaultdict(int)
+    for result in results:
+        outcomes[result["outcome"]] += 1
+    report = {
+        "requests": len(results),
+        "concurrency": args.concurrency,
+        "elapsed_seconds": elapsed,
+        "requests_per_second": len(results) / elapsed if elapsed else 0.0,
+        "error_rate": 1 - outcomes.get("passed", 0) / len(results) if results else 0.0,
+        "outcomes": dict(outcomes),
+        "latency_ms": {name: percentile(latencies, quantile) * 1000
+                       for name, quantile in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+        "stages": {},
+    }
+    for (metric, stage), histogram in sorted(stages.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+        if metric == ATTEMPTS_HISTOGRAM:
+            name, scale = f"attempts ({stage})", 1
+        else:
+            name, scale = f"{'llm' if 'llm' in metric else 'container'} {stage}", 1000
+        report["stages"][name] = {
+            "count": histogram["count"],
+            "mean": histogram["sum"] / histogram["count"] * scale,
+            "p50": histogram_quantile(histogram, 0.5) * scale,
+            "p95": histogram_quantile(histogram, 0.95) * scale,
+        }
+    return report
+
+
+def print_report(report: dict):
+    print(f"{report['requests']} requests at concurrency {report['concurrency']} in {report['elapsed_seconds']:.1f} s, "
+          f"{report['requests_per_second']:.2f} requests/s, error rate {report['error_rate']:.1%}")
+    latency = report["latency_ms"]
+    print(f"latency p50 {latency['p50']:.0f} ms, p95 {latency['p95']:.0f} ms, p99 {latency['p99']:.0f} ms")
+    print(f"outcomes: {', '.join(f'{outcome} {count}' for outcome, count in report['outcomes'].items())}")
+    if report["stages"]:
+        print(f"{'stage':<24}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}  (ms, attempts for attempts)")
+        for name, stage in report["stages"].items():
+            print(f"{name:<24}{stage['count']:>8.0f}{stage['mean']:>10.1f}{stage['p50']:>10.1f}{stage['p95']:>10.1f}")
+
+
+async def benchmark(url: str, args) -> dict:
+    suites = get_suites(args.languages.split(",") if args.languages else None)
+    async with httpx.AsyncClient(timeout=30) as client:
+        metrics_before = read_histograms((await client.get(f"{url}/metrics")).text)
+        start_time = time.time()
+        results = await run_load(url, suites, args)
+        elapsed = time.time() - start_time
+        metrics_after = read_histograms((await client.get(f"{url}/metrics")).text)
+    return build_report(results, elapsed, diff_histograms(metrics_before, metrics_after), args)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend-url", help="Benchmark a running backend instead of starting the backend and the mock")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--languages", default="python", help="Comma separated languages of the corpus suites to send")
+    parser.add_argument("--latency-ms", type=float, default=500, help="Latency of the mock OpenAI server")
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of generations the mock answers with broken code")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--use-cache", action="store_true", help="Allow result and execution cache hits")
+    parser.add_argument("--parallel-units", action="store_true")
+    parser.add_argument("--timeout", type=float, default=300, help="Timeout of a request in seconds")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    parser.add_argument("--max-error-rate", type=float, default=None)
+    parser.add_argument("--max-p95-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    if args.backend_url:
+        report = asyncio.run(benchmark(args.backend_url.rstrip("/"), args))
+    else:
+        with start_services(args) as url:
+            report = asyncio.run(benchmark(url, args))
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    failures = []
+    if args.max_error_rate is not None and report["error_rate"] > args.max_error_rate:
+        failures.append(f"error rate {report['error_rate']:.1%} above {args.max_error_rate:.1%}")
+    if args.max_p95_ms is not None and report["latency_ms"]["p95"] > args.max_p95_ms:
+        failures.append(f"p95 latency {report['latency_ms']['p95']:.0f} ms above {args.max_p95_ms:.0f} ms")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Test suites of the benchmark with the answers of the mock OpenAI server.
+
+Every suite lists its test2code units: the testcase the request sends, the implementation the mock answers
+with and a broken implementation the mock answers with instead when it simulates a failing generation.
+"""
+
+PYTHON_VERSION = "3.11"
+JAVA_VERSION = "17"
+
+SUITES = [
+    {
+        "name": "python-arithmetic",
+        "language": "python",
+        "version": PYTHON_VERSION,
+        "units": [
+            {
+                "testcase": "def test_add_numbers():\n    assert add_numbers(2, 3) == 5\n    assert add_numbers(-1, 1) == 0",
+                "implementation": "def add_numbers(a, b):\n    return a + b",
+                "broken": "def add_numbers(a, b):\n    return a - b",
+            },
+            {
+                "testcase": "def test_multiply_numbers():\n    assert multiply_numbers(3, 4) == 12",
+                "implementation": "def multiply_numbers(a, b):\n    return a * b",
+                "broken": "def multiply_numbers(a, b):\n    return a + b",
+            },
+        ],
+    },
+    {
+        "name": "python-strings",
+        "language": "python",
+        "version": PYTHON_VERSION,
+        "units": [
+            {
+                "testcase": "def test_reverse_words():\n    assert reverse_words('hello big world') == 'world big hello'",
+                "implementation": "def reverse_words(text):\n    return ' '.join(reversed(text.split()))",
+                "broken": "def reverse_words(text):\n    return text[::-1]",
+            },
+            {
+                "testcase": "def test_is_palindrome():\n    assert is_palindrome('Level')\n    assert not is_palindrome('test')",
+                "implementation": "def is_palindrome(text):\n    text = text.lower()\n    return text == text[::-1]",
+                "broken": "def is_palindrome(text):\n    return text == text[::-1]",
+            },
+        ],
+    },
+    {
+        "name": "python-collections",
+        "language": "python",
+        "version": PYTHON_VERSION,
+        "units": [
+            {
+                "testcase": "def test_chunk_list():\n    assert chunk_list([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]\n\n"
+                            "def test_chunk_list_empty():\n    assert chunk_list([], 3) == []",
+                "implementation": "def chunk_list(items, size):\n    return [items[i:i + size] for i in range(0, len(items), size)]",
+                "broken": "def chunk_list(items, size):\n    return [items[i:i + size] for i in range(0, len(items) - 1, size)]",
+            },
+            {
+                "testcase": "def test_count_words():\n    assert count_words('a b a') == {'a': 2, 'b': 1}",
+                "implementation": "def count_words(text):\n    counts = {}\n    for word in text.split():\n"
+                                  "        counts[word] = counts.get(word, 0) + 1\n    return counts",
+                "broken": "def count_words(text):\n    return {word: 1 for word in text.split()}",
+            },
+        ],
+    },
+    {
+        "name": "java-arithmetic",
+        "language": "java",
+        "version": JAVA_VERSION,
+        "units": [
+            {
+                "testcase": "@Test\npublic void testAddNumbers() {\n    assertEquals(5, addNumbers(2, 3));\n}",
+                "implementation": "public static int addNumbers(int a, int b) {\n    return a + b;\n}",
+                "broken": "public static int addNumbers(int a, int b) {\n    return a - b;\n}",
+            },
+            {
+                "testcase": "@Test\npublic void testFactorial() {\n    assertEquals(120, factorial(5));\n}",
+                "implementation": "public static int factorial(int n) {\n    return n <= 1 ? 1 : n * factorial(n - 1);\n}",
+                "broken": "public static int factorial(int n) {\n    return n;\n}",
+            },
+        ],
+    },
+    {
+        "name": "java-strings",
+        "language": "java",
+        "version": JAVA_VERSION,
+        "units": [
+            {
+                "testcase": "@Test\npublic void testReverse() {\n    assertEquals(\"cba\", reverse(\"abc\"));\n}",
+                "implementation": "public static String reverse(String text) {\n"
+                                  "    return new StringBuilder(text).reverse().toString();\n}",
+                "broken": "public static String reverse(String text) {\n    return text;\n}",
+            },
+        ],
+    },
+]
+
+
+def get_suites(languages=None):
+    """
+    Get the suites of the given languages, all suites without languages
+    """
+    return [suite for suite in SUITES if not languages or suite["language"] in languages]
+
+
+def get_testcases(suite: dict) -> str:
+    return "\n\n".join(unit["testcase"] for unit in suite["units"])
@@ -0,0 +1,75 @@
+"""
+Stress test for concurrent container runs.
+
+Fires N concurrent runs with distinct code at the container services and verifies that every run
+reports the results of its own code, i.e. no run picked up another run's image, container or files.
+Needs a running Docker daemon.
+
+Usage (from the repository root):
+    python poc/concurrency_stress.py --runs 20 --language python --version 3.11
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from services.container_service.factory import get_container_service  # noqa: E402
+
+# The run number is part of the test name and of the code, so a run that picked up another run's
+# files reports a foreign test name or a failing assertion
+PYTHON_CODE = "def run_id():\n    return {run}\n"
+PYTHON_TEST = "def test_run_{run}():\n    assert run_id() == {run}\n"
+
+JAVA_CODE = "public static int runId() {{ return {run}; }}"
+JAVA_TEST = "@Test\npublic void testRun{run}() {{ assertEquals({run}, runId()); }}"
+
+
+def run_once(language: str, version: str, run: int, logger):
+    service = get_container_service(language, version, logger)
+    if language == "python":
+        code, test_code = PYTHON_CODE.format(run=run), PYTHON_TEST.format(run=run)
+    else:
+        code, test_code = JAVA_CODE.format(run=run), JAVA_TEST.format(run=run)
+    # Every run has unique code, the execution cache must not hide the containers
+    return run, service.run_code_in_container(code, test_code, use_cache=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--language", default="python")
+    parser.add_argument("--version", default="3.11")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logger = logging.getLogger("stress")
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=args.runs) as executor:
+        futures = [executor.submit(run_once, args.language, args.version, run, logger) for run in range(args.runs)]
+        results = [future.result() for future in futures]
+    elapsed = time.time() - start_time
+
+    failures = []
+    for run, result in results:
+        if "error" in result:
+            failures.append(f"run {run}: {result['error']}")
+            continue
+        tests = result["test_results"]["tests"]
+        expected_name = f"test_run_{run}" if args.language == "python" else f"testRun{run}"
+        if len(tests) != 1 or not tests[0]["name"].endswith(expected_name) or tests[0]["outcome"] != "passed":
+            failures.append(f"run {run}: unexpected results {tests}")
+
+    print(f"{args.runs} concurrent runs in {elapsed:.1f} s, {len(failures)} failures")
+    for failure in failures:
+        print(f"  {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Mock of the OpenAI chat completions API for benchmarks.
+
+Answers with the canned test2code units of the benchmark corpus whose testcases appear in the last message,
+after a configurable latency. With --fail-rate a generation answers with the broken implementations instead,
+so the revise path of the backend runs; revisions always answer with the working implementations.
+Supports streaming (including the usage chunk), n candidates and ignores response_format.
+
+Usage (from the repository root):
+    python poc/mock_openai_server.py --port 8100 --latency-ms 800 --jitter-ms 200
+Then start the backend with OPENAI_BASE_URL=http://127.0.0.1:8100/v1 and any OPENAI_API_KEY.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from benchmark_corpus import SUITES
+
+EMPTY_ERROR = {"source": "", "type": "", "message": ""}
+# Content of a streamed answer is sent in chunks of this many characters
+STREAM_CHUNK_SIZE = 64
+
+
+def count_tokens(text: str) -> int:
+    # Rough estimate, good enough for the token histograms of the backend
+    return max(1, len(text) // 4)
+
+
+def create_app(latency_ms: float = 500, jitter_ms: float = 0, fail_rate: float = 0, seed: int = None) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    units = [unit for suite in SUITES for unit in suite["units"]]
+
+    def answer(messages: list) -> str:
+        prompt = messages[-1]["content"]
+        # Later turns of a conversation are revisions
+        revise = len(messages) > 2 or "ErrorMessage:" in prompt
+        broken = not revise and rng.random() < fail_rate
+        matching = [
+            {"testcase": unit["testcase"], "implementation": unit["broken"] if broken else unit["implementation"]}
+            for unit in units if unit["testcase"] in prompt
+        ]
+        if not matching:
+            return json.dumps({"test2code": [], "error": {
+                "source": "testcases", "type": "noValidCode", "message": "Testcases are not in the benchmark corpus"
+            }})
+        return json.dumps({"test2code": matching, "error": EMPTY_ERROR})
+
+    async def wait():
+        await asyncio.sleep(max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body["messages"]
+        prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        contents = [answer(messages) for _ in range(body.get("n") or 1)]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": sum(count_tokens(content) for content in contents),
+            "total_tokens": prompt_tokens + sum(count_tokens(content) for content in contents),
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        await wait()
+
+        if not body.get("stream"):
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": body.get("model"),
+                "choices": [
+                    {"index": index, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                    for index, content in enumerate(contents)
+                ],
+                "usage": usage,
+            }
+
+        def chunk(choices, chunk_usage=None):
+            data = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                    "model": body.get("model"), "choices": choices}
+            if chunk_usage is not None:
+                data["usage"] = chunk_usage
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def stream():
+            content = contents[0]
+            for start in range(0, len(content), STREAM_CHUNK_SIZE):
+                yield chunk([{"index": 0, "delta": {"content": content[start:start + STREAM_CHUNK_SIZE]},
+                              "finish_reason": None}])
+            yield chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield chunk([], usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0, help="Share of generations answered with broken code")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app(args.latency_ms, args.jitter_ms, args.fail_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
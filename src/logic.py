@@ -1,12 +1,19 @@
 # logic.py
 
+import asyncio
 import os
+import time
+from services.container_service.cancellation import RunCancellation
 from services.container_service.factory import (
-    get_container_service,
+    get_container_service_async,
     get_supported_languages,
     get_language_versions,
 )
+from services.cache_service import result_cache
 from services.llm_service.llm_service import CodeGenerator
+from services.llm_service.prompt_compaction import compact_failures, merge_units, select_units
+from services.logging_service import tracer
+from services.metrics_service import observe_attempts, observe_cache, observe_llm_call
 
 class CodeExecutionLogic:
     @staticmethod
@@ -34,17 +41,221 @@ class CodeExecutionLogic:
         return testcases, implementations
 
     @staticmethod
-    def check_for_failing_tests(result: any):
-        failed_message = ""
-        for test in result.get("test_results").get("tests"):
-            if test.get("outcome") == "failed":
-                test_name = test.get("name").split("::")[-1]
-                error_msg = test.get("call").get("longrepr")
-                failed_message += f"Test {test_name}: {error_msg} "
-        return failed_message
+    def get_failed_tests(result: dict) -> list:
+        """
+        Get the name and failure report of every failed test
+        """
+        return [(test.get("name").split("::")[-1], (test.get("call") or {}).get("longrepr", ""))
+                for test in (result.get("test_results") or {}).get("tests", []) if test.get("outcome") == "failed"]
 
     @classmethod
-    async def execute_testcases(cls, testcases: str, language: str, version: str, logger):
+    def check_for_failing_tests(cls, result: any):
+        if "error" in result:
+            return result["error"]
+        # Trimmed tracebacks and deduplicated failures keep the revision prompt small
+        return compact_failures(cls.get_failed_tests(result))
+
+    @staticmethod
+    def all_tests_passed(result: dict) -> bool:
+        summary = (result.get("test_results") or {}).get("summary") or {}
+        return "total" in summary and summary.get("passed") == summary.get("total")
+
+    @staticmethod
+    async def emit(on_event, event: str, **data):
+        if on_event is not None:
+            await on_event(event, data)
+
+    @classmethod
+    async def emit_test_results(cls, on_event, attempt: int, result: dict, unit: int = None):
+        # Runs of a single unit name it, see execute_units
+        unit_data = {"unit": unit} if unit is not None else {}
+        await cls.emit(
+            on_event, "container_finished", attempt=attempt, cached=result.get("cached", False),
+            build_time=result.get("build_time"), run_time=result.get("run_time"), total_time=result.get("total_time"),
+            **unit_data
+        )
+        for test in (result.get("test_results") or {}).get("tests", []):
+            await cls.emit(
+                on_event, "test_result", attempt=attempt,
+                name=test.get("name"), outcome=test.get("outcome"), duration=test.get("duration"), **unit_data
+            )
+
+    @staticmethod
+    def get_failing_test_ids(service, result: dict) -> list:
+        return [service.get_test_id(test.get("name")) for test in (result.get("test_results") or {}).get("tests", [])
+                if test.get("outcome") in ("failed", "error")]
+
+    @classmethod
+    async def run_tests(cls, service, implementations: str, testcases_str: str, previous_result: dict,
+                        use_execution_cache: bool, max_failures: int, logger, on_event=None, attempt: int = None):
+        """
+        Run the tests of an attempt. After a failed attempt the previously failing tests run first, the
+        full suite only runs to confirm once they pass.
+        :param previous_result: Result of the previous attempt, None on the first attempt
+        :param max_failures: Stop a run after this many failing tests, None runs every test
+        :return: The result of the run that decides the attempt
+        """
+        on_test_result = None
+        if on_event is not None:
+            loop = asyncio.get_running_loop()
+
+            def on_test_result(name, outcome):
+                # Called from the container executor thread
+                asyncio.run_coroutine_threadsafe(
+                    cls.emit(on_event, "test_progress", attempt=attempt, name=name, outcome=outcome), loop
+                )
+
+        failing_tests = cls.get_failing_test_ids(service, previous_result) if previous_result else []
+        if failing_tests:
+            logger.info(f"Re-running {len(failing_tests)} previously failing tests first")
+            result = await service.run_code_in_container_async(
+                implementations, testcases_str, use_cache=use_execution_cache, max_failures=max_failures,
+                only_tests=failing_tests, on_test_result=on_test_result
+            )
+            summary = (result.get("test_results") or {}).get("summary") or {}
+            if "error" not in result and not summary.get("total"):
+                # The test ids did not select any test, e.g. after the tests were renamed
+                logger.info("No previously failing test ran, running the full suite")
+            elif "error" in result or not cls.all_tests_passed(result):
+                return result
+            else:
+                logger.info("Previously failing tests pass, confirming with the full suite")
+
+        return await service.run_code_in_container_async(
+            implementations, testcases_str, use_cache=use_execution_cache, max_failures=max_failures,
+            on_test_result=on_test_result
+        )
+
+    @classmethod
+    async def run_candidates(cls, service, candidates: list, use_execution_cache: bool, logger, on_event=None):
+        """
+        Run the candidate implementations in parallel containers
+        :return: The first candidate that passes all tests and its result, otherwise the candidate with
+                 the most passing tests and its result (None if no candidate could be run)
+        """
+        cancellations = [RunCancellation() for _ in candidates]
+
+        async def run(index, candidate):
+            if candidate["error"]["type"] != "":
+                return index, None
+            testcases_str, implementations = cls.parse_testcase_and_implementation(candidate)
+            result = await service.run_code_in_container_async(
+                implementations, testcases_str, use_cache=use_execution_cache, cancellation=cancellations[index]
+            )
+            return index, result
+
+        tasks = [asyncio.create_task(run(index, candidate)) for index, candidate in enumerate(candidates)]
+        best_index, best_result, best_passed = 0, None, -1
+        try:
+            for next_finished in asyncio.as_completed(tasks):
+                index, result = await next_finished
+                if result is None:
+                    continue
+                await cls.emit(on_event, "candidate_finished", candidate=index + 1, passed=cls.all_tests_passed(result))
+                if cls.all_tests_passed(result):
+                    logger.info(f"Candidate {index + 1} of {len(candidates)} passed all tests")
+                    return candidates[index], result
+                passed = ((result.get("test_results") or {}).get("summary") or {}).get("passed", 0)
+                if passed > best_passed:
+                    best_index, best_result, best_passed = index, result, passed
+        finally:
+            # Cancelling the tasks only drops runs still queued for the container executor, the runs in the
+            # executor kill their containers, which frees their executor and run limiter slots
+            for task, cancellation in zip(tasks, cancellations):
+                task.cancel()
+                cancellation.cancel()
+        return candidates[best_index], best_result
+
+    @classmethod
+    async def execute_units(cls, service, unit_testcases: list, language: str, version: str,
+                            use_execution_cache: bool, max_failures: int, logger, on_event=None, model: str = None):
+        """
+        Generate, test and revise independent groups of testcases in parallel. Every group has its own LLM
+        conversation and its own test runs, so only the failing groups are revised and run again.
+        :param unit_testcases: The groups of testcases from split_testcases of the service
+        :param model: Model requested for the job, None to route between the small and the default model
+        :return: Tuple of the merged LLM response, the attempts used and whether every group passed
+        """
+        concurrency = asyncio.Semaphore(max(1, int(os.getenv("UNIT_CONCURRENCY", "4"))))
+        generators = [CodeGenerator(logger, model=model) for _ in unit_testcases]
+        responses = [None] * len(unit_testcases)
+        results = [None] * len(unit_testcases)
+
+        async def generate(index):
+            async with concurrency:
+                await cls.emit(on_event, "llm_started", stage="generate", unit=index + 1)
+                llm_start_time = time.time()
+                with tracer.span("generate", language=language, version=version, unit=index + 1):
+                    responses[index] = await generators[index].generate_implementation(unit_testcases[index])
+                observe_llm_call(
+                    "generate", language, version, time.time() - llm_start_time, generators[index].last_usage,
+                    generators[index].model
+                )
+                await cls.emit(
+                    on_event, "llm_finished", stage="generate", unit=index + 1,
+                    duration=(time.time() - llm_start_time) * 1000, model=generators[index].model,
+                    **(generators[index].last_usage or {})
+                )
+
+        async def run(index, attempt):
+            testcases_str, implementations = cls.parse_testcase_and_implementation(responses[index])
+            results[index] = await cls.run_tests(
+                service, implementations, testcases_str, results[index], use_execution_cache, max_failures,
+                logger, on_event, attempt=attempt
+            )
+            await cls.emit_test_results(on_event, attempt, results[index], unit=index + 1)
+
+        async def revise(index, attempt):
+            testcases_str, implementations = cls.parse_testcase_and_implementation(responses[index])
+            async with concurrency:
+                await cls.emit(on_event, "llm_started", stage="revise", attempt=attempt, unit=index + 1)
+                llm_start_time = time.time()
+                with tracer.span("revise", language=language, version=version, attempt=attempt, unit=index + 1):
+                    responses[index] = await generators[index].revise_implementation(
+                        testcases_str, implementations, responses[index]["error"]["message"]
+                    )
+                observe_llm_call(
+                    "revise", language, version, time.time() - llm_start_time, generators[index].last_usage,
+                    generators[index].model
+                )
+                await cls.emit(
+                    on_event, "llm_finished", stage="revise", attempt=attempt, unit=index + 1,
+                    duration=(time.time() - llm_start_time) * 1000, model=generators[index].model,
+                    **(generators[index].last_usage or {})
+                )
+
+        await asyncio.gather(*(generate(index) for index in range(len(unit_testcases))))
+        failing = list(range(len(unit_testcases)))
+        tries = 0
+        for tries in range(4):
+            logger.info(f"Attempt {tries + 1} to run {len(failing)} of {len(unit_testcases)} units in containers")
+            await cls.emit(on_event, "attempt_started", attempt=tries + 1)
+            runnable = [index for index in failing if responses[index]["error"]["type"] == ""]
+            await asyncio.gather(*(run(index, tries + 1) for index in runnable))
+            for index in runnable:
+                if cls.all_tests_passed(results[index]):
+                    failing.remove(index)
+                else:
+                    responses[index]["error"]["message"] = cls.check_for_failing_tests(results[index])
+                    responses[index]["error"]["type"] = "failedDockerCheck"
+                    responses[index]["error"]["source"] = "docker"
+            logger.info(f"{len(unit_testcases) - len(failing)} of {len(unit_testcases)} units pass")
+
+            revisable = [index for index in failing if responses[index]["error"]["source"] in ["implementation", "docker"]]
+            if not failing or not revisable or tries == 3:
+                break
+            logger.info(f"Revising {len(revisable)} units in parallel")
+            await asyncio.gather(*(revise(index, tries + 1) for index in revisable))
+
+        # The error of the first failing group is the error of the whole response
+        error = next((responses[index]["error"] for index in failing), {"source": "", "type": "", "message": ""})
+        merged = {"test2code": [unit for response in responses for unit in response["test2code"]], "error": error}
+        return merged, tries + 1, not failing
+
+    @classmethod
+    async def execute_testcases(cls, testcases: str, language: str, version: str, logger, on_event=None,
+                                use_cache: bool = True, use_execution_cache: bool = True, candidates: int = 1,
+                                max_failures: int = None, parallel_units: bool = False, model: str = None):
         # Log the received request
         logger.info(f"execute_testcases called with language='{language}', version='{version}', testcases length={len(testcases)}")
 
@@ -58,28 +269,118 @@ class CodeExecutionLogic:
             return {"error": "Version not supported"}
 
         try:
-            openai_api_key = os.getenv("OPENAI_API_KEY")
-            code_generator = CodeGenerator(openai_api_key, logger)
+            # Before the cache lookup, so an unknown model is rejected on cache hits too.
+            # The models of the job are part of the key, the results of different models never mix.
+            code_generator = CodeGenerator(logger, model=model)
+            cache_key = result_cache.get_key(testcases, language, version, code_generator.model_spec)
+            if use_cache:
+                cached_response = await result_cache.get(cache_key)
+                observe_cache("result", cached_response is not None, language, version)
+                if cached_response is not None:
+                    logger.info("Returning cached implementation")
+                    await cls.emit(on_event, "cache_hit")
+                    return cached_response
+
+            async def on_generate_token(token):
+                await cls.emit(on_event, "llm_token", stage="generate", token=token)
+
+            async def on_revise_token(token):
+                await cls.emit(on_event, "llm_token", stage="revise", token=token)
+
+            candidates = max(1, min(candidates, int(os.getenv("MAX_CANDIDATES", "5"))))
+            service = None
+            result = None
+            previous_result = None
+            failed_tests = []
+            first_attempt = 0
 
-            logger.info("Generating implementation using OpenAI API")
-            llm_response_obj = code_generator.generate_implementation(testcases)
+            unit_testcases = [testcases]
+            if parallel_units and candidates == 1:
+                service = await get_container_service_async(language, version, logger)
+                unit_testcases = service.split_testcases(testcases)
 
-            logger.info("Received implementation from OpenAI")
+            if len(unit_testcases) > 1:
+                logger.info(f"Generating {len(unit_testcases)} independent units in parallel")
+                llm_response_obj, attempts, units_passed = await cls.execute_units(
+                    service, unit_testcases, language, version, use_execution_cache, max_failures, logger, on_event,
+                    model=model
+                )
+                if not units_passed:
+                    logger.info("Units still failing after the last attempt, returning last response")
+                    observe_attempts(language, version, attempts, passed=False)
+                    return llm_response_obj
+                # The units pass on their own, the merged code runs once more as a whole in the same attempt.
+                # Should it fail, the whole response is revised in the following attempts.
+                code_generator.continue_conversation(testcases, llm_response_obj)
+                first_attempt = attempts - 1
+            elif candidates > 1:
+                await cls.emit(on_event, "llm_started", stage="generate")
+                llm_start_time = time.time()
+                # Speculative mode: spend more tokens on parallel candidates to save round trips
+                logger.info(f"Generating {candidates} candidate implementations using {code_generator.model}")
+                with tracer.span("generate", language=language, version=version, candidates=candidates):
+                    candidate_objs = await code_generator.generate_implementations(testcases, candidates)
+                observe_llm_call(
+                    "candidates", language, version, time.time() - llm_start_time, code_generator.last_usage,
+                    code_generator.model
+                )
+                await cls.emit(
+                    on_event, "llm_finished", stage="generate", duration=(time.time() - llm_start_time) * 1000,
+                    model=code_generator.model, **(code_generator.last_usage or {})
+                )
+
+                service = await get_container_service_async(language, version, logger)
+                llm_response_obj, result = await cls.run_candidates(
+                    service, candidate_objs, use_execution_cache, logger, on_event
+                )
+                code_generator.continue_conversation(testcases, llm_response_obj)
+            else:
+                await cls.emit(on_event, "llm_started", stage="generate")
+                llm_start_time = time.time()
+                logger.info(f"Generating implementation using {code_generator.model}")
+                with tracer.span("generate", language=language, version=version):
+                    llm_response_obj = await code_generator.generate_implementation(
+                        testcases, on_token=on_generate_token if on_event else None
+                    )
+                observe_llm_call(
+                    "generate", language, version, time.time() - llm_start_time, code_generator.last_usage,
+                    code_generator.model
+                )
+                await cls.emit(
+                    on_event, "llm_finished", stage="generate", duration=(time.time() - llm_start_time) * 1000,
+                    model=code_generator.model, **(code_generator.last_usage or {})
+                )
+
+            logger.info(f"Received implementation from {code_generator.model}")
             testcases_str, implementations = cls.parse_testcase_and_implementation(llm_response_obj)
             logger.info("Parsed testcases and implementations")
 
-            for tries in range(4):
+            for tries in range(first_attempt, 4):
                 logger.info(f"Attempt {tries+1} to run code in container")
+                await cls.emit(on_event, "attempt_started", attempt=tries + 1)
                 if llm_response_obj["error"]["type"] == "":
-                    service = get_container_service(language, version, logger)
-                    result = service.run_code_in_container(implementations, testcases_str)
+                    if result is None:
+                        if service is None:
+                            service = await get_container_service_async(language, version, logger)
+                        result = await cls.run_tests(
+                            service, implementations, testcases_str, previous_result, use_execution_cache,
+                            max_failures, logger, on_event, attempt=tries + 1
+                        )
 
-                    logger.info(f"Container run result: {result}")
+                    # Only the summary, the full result holds every traceback of the run
+                    summary = (result.get("test_results") or {}).get("summary")
+                    logger.info(f"Container run result: {summary or result.get('error')}, run time {result.get('run_time')} ms")
+                    await cls.emit_test_results(on_event, tries + 1, result)
 
-                    if result.get("test_results").get("summary").get("passed") == result.get("test_results").get("summary").get("total"):
+                    if cls.all_tests_passed(result):
                         logger.info("All tests passed")
+                        observe_attempts(language, version, tries + 1, passed=True)
+                        await result_cache.set(cache_key, llm_response_obj)
                         return llm_response_obj
                     else:
+                        previous_result = result
+                        # Parametrized tests are reported as name[params], the unit contains the plain name
+                        failed_tests = [name.split("[")[0] for name, _ in cls.get_failed_tests(result)]
                         error_message = cls.check_for_failing_tests(result)
                         llm_response_obj["error"]["message"] = error_message
                         llm_response_obj["error"]["type"] = "failedDockerCheck"
@@ -87,16 +388,48 @@ class CodeExecutionLogic:
 
                 if llm_response_obj["error"]["source"] in ["implementation", "docker"]:
                     logger.info("Revising implementation due to error")
-                    llm_response_obj = code_generator.revise_implementation(
-                        testcases_str,
-                        implementations,
-                        llm_response_obj["error"]["message"]
+                    # Only send the units that contain a failing test, the passing units are kept as they are
+                    units = llm_response_obj["test2code"]
+                    unit_indices = select_units(units, failed_tests) if failed_tests else []
+                    if unit_indices and len(unit_indices) < len(units):
+                        logger.info(f"Revising {len(unit_indices)} of {len(units)} units")
+                        revise_testcases, revise_implementations = cls.parse_testcase_and_implementation(
+                            {"test2code": [units[index] for index in unit_indices]}
+                        )
+                    else:
+                        unit_indices = []
+                        revise_testcases, revise_implementations = testcases_str, implementations
+
+                    await cls.emit(on_event, "llm_started", stage="revise", attempt=tries + 1)
+                    llm_start_time = time.time()
+                    with tracer.span("revise", language=language, version=version, attempt=tries + 1):
+                        revised_obj = await code_generator.revise_implementation(
+                            revise_testcases,
+                            revise_implementations,
+                            llm_response_obj["error"]["message"],
+                            on_token=on_revise_token if on_event else None
+                        )
+                    if unit_indices:
+                        revised_obj["test2code"] = merge_units(units, unit_indices, revised_obj["test2code"])
+                    llm_response_obj = revised_obj
+                    observe_llm_call(
+                        "revise", language, version, time.time() - llm_start_time, code_generator.last_usage,
+                        code_generator.model
+                    )
+                    logger.info(f"Revision of attempt {tries + 1} used {code_generator.last_usage} tokens")
+                    await cls.emit(
+                        on_event, "llm_finished", stage="revise", attempt=tries + 1,
+                        duration=(time.time() - llm_start_time) * 1000, model=code_generator.model,
+                        **(code_generator.last_usage or {})
                     )
 
+                result = None
+                failed_tests = []
                 testcases_str, implementations = cls.parse_testcase_and_implementation(llm_response_obj)
                 logger.info("Parsed revised testcases and implementations")
 
             logger.info("Maximum retries reached, returning last response")
+            observe_attempts(language, version, 4, passed=False)
             return llm_response_obj
 
         except ValueError as e:
@@ -104,4 +437,39 @@ class CodeExecutionLogic:
             return {"error": str(e)}
         except Exception as e:
             logger.error(f"An unexpected error occurred: {str(e)}")
-            return {"error": f"An unexpected error occurred: {str(e)}"}
\ No newline at end of file
+            return {"error": f"An unexpected error occurred: {str(e)}"}
+
+    @classmethod
+    async def execute_batch(cls, items: list, logger, on_event=None, use_cache: bool = True,
+                            use_execution_cache: bool = True):
+        """
+        Run many testcase suites, sharing the application-wide LLM and Docker clients.
+        The suites are processed by a bounded number of workers, grouped by language and version so
+        consecutive runs hit the same warm runtime.
+        :param items: Suites with testcases, language, version and optionally candidates, max_failures, parallel_units
+                      and model
+        :return: The results in the order of the items
+        """
+        max_workers = max(1, int(os.getenv("BATCH_WORKERS", "4")))
+        queue = asyncio.Queue()
+        for index in sorted(range(len(items)), key=lambda i: (items[i]["language"].lower(), items[i]["version"])):
+            queue.put_nowait(index)
+        results = [None] * len(items)
+
+        async def worker():
+            while not queue.empty():
+                index = queue.get_nowait()
+                item = items[index]
+                await cls.emit(on_event, "item_started", index=index, language=item["language"], version=item["version"])
+                result = await cls.execute_testcases(
+                    item["testcases"], item["language"], item["version"], logger,
+                    use_cache=use_cache, use_execution_cache=use_execution_cache,
+                    candidates=item.get("candidates") or 1, max_failures=item.get("max_failures"),
+                    parallel_units=item.get("parallel_units") or False, model=item.get("model")
+                )
+                results[index] = result
+                await cls.emit(on_event, "item_completed", index=index, result=result)
+
+        logger.info(f"Running batch of {len(items)} suites with {min(max_workers, len(items))} workers")
+        await asyncio.gather(*(worker() for _ in range(min(max_workers, len(items)))))
+        return results
@@ -7,9 +7,27 @@ from fastapi.middleware.cors import CORSMiddleware
 import dotenv
 
 from router import router
+from logic import CodeExecutionLogic
+from services.cache_service import result_cache
+from services.container_service.concurrency import run_limiter
+from services.container_service.docker_client import docker_clients
+from services.container_service.factory import get_supported_languages, prebuild_runner_images
+from services.container_service.local_python_service import LocalPythonService
+from services.container_service.execution_cache import execution_cache
+from services.container_service.executor import container_executor
+from services.container_service.pool import container_pool
+from services.container_service.sandbox import sandbox_scheduler
+from services.job_service import job_queue
+from services.llm_service.llm_client import llm_clients, local_llm_clients
+from services.llm_service.providers import llm_router
+from services.logging_service import configure_logging, tracer
+from services.metrics_service import observe_http_request
 
 import logging
+import threading
+import time
 import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime
 import os
 
@@ -20,25 +38,9 @@ log_dir = os.path.join(os.path.dirname(__file__), 'logs')
 os.makedirs(log_dir, exist_ok=True)
 filename = os.path.join(log_dir, f'app_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
 
-# Custom Formatter to handle missing 'request_id'
-class RequestIDFormatter(logging.Formatter):
-    def format(self, record):
-        if not hasattr(record, 'request_id'):
-            record.request_id = 'N/A'
-        return super(RequestIDFormatter, self).format(record)
-
-formatter = RequestIDFormatter(
-    '%(asctime)s - %(levelname)s - [Request ID: %(request_id)s] - %(message)s'
-)
-
-handler = logging.FileHandler(filename)
-handler.setLevel(logging.INFO)
-handler.setFormatter(formatter)
-
-# Configure the root logger
+# Configure the root logger, records are written by a background thread
+log_listener = configure_logging(filename)
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-logger.addHandler(handler)
 
 origins = [
     "http://localhost",
@@ -49,7 +51,36 @@ origins = [
     "http://65.109.96.234:80"
 ]
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Clients shared by all requests, connected on first use
+    docker_clients.configure_from_env()
+    llm_clients.configure_from_env()
+    local_llm_clients.configure_from_env()
+    llm_router.configure_from_env()
+    # Build the runner images in the background, requests for a runtime that is not ready yet build it on demand
+    if os.getenv("PREBUILD_RUNNER_IMAGES", "false").lower() == "true":
+        threading.Thread(target=prebuild_runner_images, args=(logger,), daemon=True).start()
+    result_cache.configure_from_env()
+    execution_cache.configure_from_env()
+    LocalPythonService.check_network_isolation(logger)
+    run_limiter.configure_from_env(get_supported_languages())
+    sandbox_scheduler.configure_from_env(get_supported_languages())
+    container_pool.configure_from_env()
+    container_pool.start()
+    job_queue.configure_from_env()
+    await job_queue.start(CodeExecutionLogic.execute_testcases)
+    yield
+    await job_queue.stop()
+    container_pool.shutdown()
+    container_executor.shutdown(wait=False, cancel_futures=True)
+    result_cache.close()
+    docker_clients.close()
+    await llm_clients.close()
+    await local_llm_clients.close()
+    log_listener.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -74,8 +105,16 @@ async def add_unique_id_and_log(request: Request, call_next):
     # Log the request
     logger_adapter.info(f"Request from IP {client_ip}: {request.method} {request.url.path}")
 
-    # Proceed with the request
-    response = await call_next(request)
+    # Proceed with the request, the request id is the trace id of its spans
+    start_time = time.time()
+    tracer.start_trace(request_id)
+    with tracer.span("http_request", method=request.method, path=request.url.path):
+        response = await call_next(request)
+
+    # Label by the route template, so path parameters like job ids do not create new series
+    route = request.scope.get("route")
+    observe_http_request(request.method, route.path if route else "unmatched", response.status_code,
+                         time.time() - start_time)
 
     # Optionally log the response status code
     logger_adapter.info(f"Response: Status code {response.status_code}")
@@ -1,10 +1,39 @@
 # router.py
 
-from fastapi import APIRouter, Request
+import asyncio
+import os
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
 from logic import CodeExecutionLogic
+from services.cache_service import result_cache
+from services.container_service.concurrency import run_limiter
+from services.container_service.docker_client import docker_clients
+from services.container_service.execution_cache import execution_cache
+from services.container_service.pool import container_pool
+from services.container_service.sandbox import sandbox_scheduler
+from services.event_service import EventStream, format_sse
+from services.job_service import JobQueueFullError, job_queue
+from services.llm_service.llm_client import llm_clients
+from services.llm_service.providers import llm_router
+from services.metrics_service import CONTENT_TYPE_LATEST, render_metrics, set_active_runs, set_job_queue_depth
 
 router = APIRouter()
 
+class BatchItem(BaseModel):
+    testcases: str
+    language: str
+    version: str
+    candidates: int = 1
+    max_failures: Optional[int] = None
+    parallel_units: bool = False
+    model: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+
 @router.get("/languages")
 async def get_languages(request: Request):
     logger = request.state.logger
@@ -16,7 +45,131 @@ async def get_language_versions(language: str, request: Request):
     return CodeExecutionLogic.get_language_versions(language, logger)
 
 @router.post("/testcases")
-async def upload_testcases(testcases: str, language: str, version: str, request: Request):
+async def upload_testcases(testcases: str, language: str, version: str, request: Request,
+                           use_cache: bool = True, use_execution_cache: bool = True, candidates: int = 1,
+                           max_failures: int = None, parallel_units: bool = False, model: str = None):
     logger = request.state.logger
-    result = await CodeExecutionLogic.execute_testcases(testcases, language, version, logger)
+    result = await CodeExecutionLogic.execute_testcases(
+        testcases, language, version, logger, use_cache=use_cache, use_execution_cache=use_execution_cache,
+        candidates=candidates, max_failures=max_failures, parallel_units=parallel_units, model=model
+    )
     return result
+
+@router.post("/testcases/batch")
+async def upload_testcases_batch(batch: BatchRequest, request: Request, stream: bool = False,
+                                 use_cache: bool = True, use_execution_cache: bool = True):
+    logger = request.state.logger
+    max_items = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+    if len(batch.items) > max_items:
+        logger.error(f"Batch of {len(batch.items)} suites exceeds the limit of {max_items}")
+        raise HTTPException(status_code=400, detail=f"A batch may contain at most {max_items} suites")
+    items = [item.model_dump() for item in batch.items]
+
+    if not stream:
+        results = await CodeExecutionLogic.execute_batch(
+            items, logger, use_cache=use_cache, use_execution_cache=use_execution_cache
+        )
+        return {"results": results}
+
+    events = EventStream()
+
+    async def run():
+        try:
+            await CodeExecutionLogic.execute_batch(
+                items, logger, on_event=events.emit, use_cache=use_cache, use_execution_cache=use_execution_cache
+            )
+            await events.emit("completed", {})
+        except Exception as e:
+            await events.emit("failed", {"error": str(e)})
+        finally:
+            events.close()
+
+    async def event_stream():
+        subscription = events.subscribe()
+        task = asyncio.create_task(run())
+        try:
+            async for event in subscription:
+                yield format_sse(event)
+        finally:
+            task.cancel()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@router.get("/cache/stats")
+async def get_cache_stats(request: Request):
+    return {"results": result_cache.stats(), "executions": execution_cache.stats()}
+
+@router.get("/clients/stats")
+async def get_client_stats(request: Request):
+    return {"docker": docker_clients.stats(), "llm": llm_clients.stats(), "container_pool": container_pool.stats(),
+            "sandbox": sandbox_scheduler.stats(), "llm_routing": llm_router.stats()}
+
+@router.get("/metrics")
+async def get_metrics(request: Request):
+    set_job_queue_depth(job_queue.depth)
+    set_active_runs(run_limiter.active_runs)
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+@router.post("/testcases/stream")
+async def stream_testcases(testcases: str, language: str, version: str, request: Request, candidates: int = 1,
+                           max_failures: int = None, parallel_units: bool = False, model: str = None):
+    logger = request.state.logger
+    events = EventStream()
+
+    async def run():
+        try:
+            result = await CodeExecutionLogic.execute_testcases(
+                testcases, language, version, logger, on_event=events.emit, candidates=candidates,
+                max_failures=max_failures, parallel_units=parallel_units, model=model
+            )
+            await events.emit("completed", {"result": result})
+        except Exception as e:
+            await events.emit("failed", {"error": str(e)})
+        finally:
+            events.close()
+
+    async def stream():
+        subscription = events.subscribe()
+        task = asyncio.create_task(run())
+        try:
+            async for event in subscription:
+                yield format_sse(event)
+        finally:
+            # Stop the generation when the client disconnects
+            task.cancel()
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+@router.post("/jobs/testcases", status_code=202)
+async def submit_testcases_job(testcases: str, language: str, version: str, request: Request, candidates: int = 1,
+                               max_failures: int = None, parallel_units: bool = False, model: str = None):
+    logger = request.state.logger
+    try:
+        job = await job_queue.submit(
+            {"testcases": testcases, "language": language, "version": version, "candidates": candidates,
+             "max_failures": max_failures, "parallel_units": parallel_units, "model": model},
+            logger
+        )
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request, wait: float = 0):
+    job = await job_queue.wait(job_id, timeout=min(max(wait, 0), 60))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        yield format_sse({"event": "status", "data": job.to_dict()})
+        async for event in job.events.subscribe():
+            yield format_sse(event)
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
@@ -0,0 +1,7 @@
+# __init__.py
+
+from .result_cache import ResultCache, normalize_testcases, result_cache
+
+__all__ = ['ResultCache',
+           'normalize_testcases',
+           'result_cache']
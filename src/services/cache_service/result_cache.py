@@ -0,0 +1,176 @@
+# result_cache.py
+
+import ast
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# String literals are kept as they are, comments are dropped and whitespace runs collapsed
+C_STYLE_TOKEN_PATTERN = re.compile(
+    r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|//[^\n]*|/\*.*?\*/|(\s+)',
+    re.DOTALL,
+)
+
+
+def _normalize_c_style(source: str) -> str:
+    def replace(match):
+        # Keep string literals, turn comments and whitespace runs into a single space
+        return match.group(1) if match.group(1) is not None else " "
+    # The second pass merges the whitespace left around removed comments
+    without_comments = C_STYLE_TOKEN_PATTERN.sub(replace, source)
+    return C_STYLE_TOKEN_PATTERN.sub(replace, without_comments).strip()
+
+
+def normalize_testcases(testcases: str, language: str) -> str:
+    """
+    Normalize testcases so formatting and comment changes map to the same cache key
+    :param testcases: The submitted testcases
+    :param language: Language of the testcases
+    :return: The normalized testcases
+    """
+    if language == "python":
+        try:
+            return ast.dump(ast.parse(testcases))
+        except SyntaxError:
+            # Invalid code is cached by its text, the LLM handles the error
+            return "\n".join(line.rstrip() for line in testcases.strip().splitlines())
+    return _normalize_c_style(testcases)
+
+
+class ResultCache:
+    """
+    Cache of verified generation results keyed by normalized testcases, language and version.
+    Entries live in an in-memory LRU tier and optionally in a SQLite tier that survives restarts.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 86400, path: str = None):
+        self.enabled = True
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def configure_from_env(self):
+        self.enabled = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+        self.max_entries = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", str(self.max_entries)))
+        self.ttl = float(os.getenv("RESULT_CACHE_TTL", str(self.ttl)))
+        self.path = os.getenv("RESULT_CACHE_PATH", self.path or "") or None
+        if self.enabled and self.path:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            with self._lock, self._connection:
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+                )
+
+    def close(self):
+        if self._connection is not None:
+            with self._lock:
+                self._connection.close()
+            self._connection = None
+
+    @staticmethod
+    def get_key(testcases: str, language: str, version: str, model: str = "") -> str:
+        """
+        :param model: Models of the job as resolved by the LLM router, results of different models never mix
+        """
+        normalized = normalize_testcases(testcases, language)
+        return hashlib.sha256(f"{language}\0{version}\0{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _get_from_memory(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _put_in_memory(self, key: str, value: Dict[str, Any], stored_at: float):
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _get_from_disk(self, key: str):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, stored_at FROM results WHERE key = ? AND stored_at >= ?",
+                (key, time.time() - self.ttl),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def _put_on_disk(self, key: str, value: Dict[str, Any], stored_at: float):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (key, json.dumps(value), stored_at)
+            )
+            self._connection.execute("DELETE FROM results WHERE stored_at < ?", (time.time() - self.ttl,))
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result
+        :param key: Key from get_key
+        :return: A copy of the cached result or None on a miss
+        """
+        if not self.enabled:
+            return None
+        value = self._get_from_memory(key)
+        if value is None and self._connection is not None:
+            entry = await asyncio.to_thread(self._get_from_disk, key)
+            if entry is not None:
+                value, stored_at = entry
+                self._put_in_memory(key, value, stored_at)
+                self.disk_hits += 1
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return copy.deepcopy(value)
+
+    async def set(self, key: str, value: Dict[str, Any]):
+        if not self.enabled:
+            return
+        value = copy.deepcopy(value)
+        stored_at = time.time()
+        self._put_in_memory(key, value, stored_at)
+        if self._connection is not None:
+            await asyncio.to_thread(self._put_on_disk, key, value, stored_at)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+result_cache = ResultCache()
@@ -1,11 +1,36 @@
 # __init__.py
 
 from .base import ContainerService
-from .factory import get_container_service
+from .cancellation import RunCancellation, RunCancelledError
+from .concurrency import ConcurrencyLimiter, run_limiter
+from .docker_client import DockerClientProvider, docker_clients
+from .execution_cache import ExecutionCache, execution_cache
+from .factory import get_container_service, get_container_service_async, prebuild_runner_images
+from .image_registry import RunnerImageRegistry, runner_images
 from .java_service import JavaContainerService
+from .local_python_service import LocalPythonService
+from .pool import ContainerPool, container_pool
 from .python_service import PythonContainerService
+from .sandbox import SandboxScheduler, sandbox_scheduler
 
 __all__ = ['ContainerService',
            'PythonContainerService',
            'JavaContainerService',
-           'get_container_service']
+           'LocalPythonService',
+           'get_container_service',
+           'get_container_service_async',
+           'prebuild_runner_images',
+           'RunnerImageRegistry',
+           'runner_images',
+           'ContainerPool',
+           'container_pool',
+           'ExecutionCache',
+           'execution_cache',
+           'ConcurrencyLimiter',
+           'run_limiter',
+           'DockerClientProvider',
+           'docker_clients',
+           'SandboxScheduler',
+           'sandbox_scheduler',
+           'RunCancellation',
+           'RunCancelledError']
@@ -0,0 +1,65 @@
+# archive.py
+
+import io
+import tarfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Union
+
+
+def create_tar_archive(files: Dict[str, Union[str, bytes]]) -> bytes:
+    """
+    Build an in-memory tar archive from a mapping of relative paths to file contents
+    :param files: Mapping of archive member names to their content
+    :return: The tar archive as bytes, ready for put_archive or a custom build context
+    """
+    tar_stream = io.BytesIO()
+    with tarfile.open(fileobj=tar_stream, mode="w") as tar:
+        for name, content in files.items():
+            data = content.encode("utf-8") if isinstance(content, str) else content
+            info = tarfile.TarInfo(name=name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(data))
+    return tar_stream.getvalue()
+
+
+class ChunkReader(io.RawIOBase):
+    """
+    File-like view of an iterable of byte chunks, e.g. the stream returned by get_archive
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+@contextmanager
+def open_archive_member(chunks: Iterable[bytes]):
+    """
+    Open the first file of a streamed tar archive without buffering the archive
+    :param chunks: The tar archive as an iterable of byte chunks
+    :return: Context manager yielding a binary file object that reads the member as it streams in
+    """
+    stream = io.BufferedReader(ChunkReader(chunks), buffer_size=64 * 1024)
+    with tarfile.open(fileobj=stream, mode="r|") as tar:
+        for member in tar:
+            if member.isfile():
+                yield tar.extractfile(member)
+                return
+        raise FileNotFoundError("The archive does not contain a file")
@@ -1,46 +1,112 @@
 # base.py
 
-import docker
-import tempfile
-import os
+import io
 import uuid
 import time
 import json
-import tarfile
-import io
+import socket
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from contextlib import contextmanager
+from functools import partial
+from typing import Dict, Any, List, Optional, Tuple
 
 import logging
-from docker.errors import DockerException
+from docker.errors import DockerException, ImageNotFound
+
+from services.logging_service import tracer
+from services.metrics_service import observe_cache, observe_container_run
+
+from .archive import ChunkReader, create_tar_archive, open_archive_member
+from .cancellation import RunCancellation, RunCancelledError
+from .concurrency import run_limiter
+from .docker_client import docker_clients
+from .execution_cache import execution_cache
+from .executor import run_in_container_executor
+from .image_registry import runner_images
+from .pool import container_pool
+from .sandbox import SandboxCapacityError, SandboxTimeoutError, sandbox_scheduler
 
 
 class ContainerService(ABC):
-    def __init__(self, version: str = None, logger=None):
+    LANGUAGE: str = None
+    WORKDIR = "/app"
+    REQUIRES_DOCKER = True
+
+    def __init__(self, version: str = None, logger=None, docker_client=None):
         self.version = version
         self.logger = logger or logging.getLogger(__name__)
-        try:
-            self.docker_client = docker.from_env()
-        except DockerException as e:
-            self.logger.error(f"Error connecting to Docker: {str(e)}")
-            raise ValueError(
-                f"Error connecting to Docker (Docker running and configured correctly?): {str(e)}"
-            )
+        self.docker_client = docker_client
+        if self.REQUIRES_DOCKER and self.docker_client is None:
+            # The shared client keeps its connections alive across requests
+            self.docker_client = docker_clients.get(self.logger)
 
     @abstractmethod
-    def get_dockerfile_content(self, filename: str) -> str:
+    def get_runner_dockerfile_content(self) -> str:
         pass
 
+    def get_runner_context_files(self) -> Dict[str, bytes]:
+        """
+        Get additional files for the runner image build context, next to the Dockerfile
+        :return: Mapping of context paths to file contents
+        """
+        return {}
+
     @abstractmethod
-    def get_run_command(self, filename: str) -> str:
+    def get_run_command(self, filename: str, max_failures: int = None, only_tests: List[str] = None):
+        """
+        Get the command that runs the tests
+        :param filename: Filename of the source file (without extension)
+        :param max_failures: Stop the run after this many failing tests
+        :param only_tests: Run only these tests (ids from get_test_id) instead of the whole suite
+        """
         pass
 
+    def get_test_id(self, test_name: str) -> str:
+        """
+        Get the id of a test from its name in the test results, the id selects the test in only_tests
+        """
+        return test_name
+
+    def parse_progress_line(self, line: str) -> Optional[Tuple[str, str]]:
+        """
+        Parse a line of the test run output into the name and outcome of a finished test
+        :return: Tuple of test name and outcome, None if the line does not report a finished test
+        """
+        return None
+
+    def split_testcases(self, testcases: str) -> List[str]:
+        """
+        Split testcases into groups that exercise disjoint code, every group can be implemented and
+        tested on its own
+        :param testcases: The testcases of a request
+        :return: The groups, a single group if the testcases cannot be split
+        """
+        return [testcases]
+
+    def stream_test_progress(self, chunks, on_test_result):
+        """
+        Report finished tests from the streamed output of a test run
+        :param chunks: The output of the run as byte chunks
+        :param on_test_result: Callable called with the name and outcome of every finished test
+        """
+        pending = b""
+        for chunk in chunks:
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                progress = self.parse_progress_line(line.decode("utf-8", errors="replace"))
+                if progress is not None:
+                    on_test_result(*progress)
+
     @abstractmethod
     def get_file_extension(self) -> str:
         pass
 
     def parse_test_results(self, json_content: str) -> Dict[str, Any]:
-        data = json.loads(json_content)
+        return self.format_test_report(json.loads(json_content))
+
+    def format_test_report(self, data: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "summary": data["summary"],
             "tests": [
@@ -56,65 +122,439 @@ class ContainerService(ABC):
             ],
         }
 
-    def run_code_in_container(self, code: str, test_code: str) -> Dict[str, Any]:
-        self.logger.info(f"Running code in container, code length: {len(code)}, test_code length: {len(test_code)}")
+    def get_reset_command(self):
+        """
+        Get the command that removes the files of a run from a pooled container
+        :return: Command as a list of arguments
+        """
+        return ["sh", "-c", f"rm -rf {self.WORKDIR}/* {self.WORKDIR}/.[!.]*"]
+
+    def get_filename(self) -> str:
+        return f"code_{uuid.uuid4().hex}"
+
+    def get_source_files(self, filename: str, code: str, test_code: str) -> Dict[str, str]:
+        """
+        Get the files that are injected into the runner container for a run
+        :param filename: Filename of the source file (without extension)
+        :param code: Source code
+        :param test_code: Test code
+        :return: Mapping of paths relative to the working directory to file contents
+        """
+        content = code
+        if test_code:
+            content += "\n\n" + test_code
+        return {f"{filename}.{self.get_file_extension()}": content}
+
+    def get_workspace_paths(self) -> List[str]:
+        """
+        Get the directories a run writes its sources and results to, mounted as tmpfs when SANDBOX_TMPFS_MB is set
+        """
+        return [self.WORKDIR]
+
+    def get_container_options(self) -> Dict[str, Any]:
+        return sandbox_scheduler.get_container_options(self.LANGUAGE, self.get_workspace_paths())
+
+    def exec_with_input(self, container, command, data: bytes):
+        """
+        Run a command in a started container with the data on its standard input
+        :raises RuntimeError: If the command fails
+        """
+        api = container.client.api
+        exec_id = api.exec_create(container.id, command, stdin=True, workdir=self.WORKDIR)["Id"]
+        exec_socket = api.exec_start(exec_id, socket=True)
+        raw_socket = getattr(exec_socket, "_sock", exec_socket)
         try:
-            with tempfile.TemporaryDirectory() as temp_dir:
-                unique_filename = f"code_{uuid.uuid4().hex}"
-                file_path = os.path.join(
-                    temp_dir, f"{unique_filename}.{self.get_file_extension()}"
-                )
+            raw_socket.sendall(data)
+            raw_socket.shutdown(socket.SHUT_WR)
+            # The output ends when the command exits
+            while raw_socket.recv(65536):
+                pass
+        finally:
+            exec_socket.close()
+        for _ in range(50):
+            state = api.exec_inspect(exec_id)
+            if not state.get("Running"):
+                break
+            time.sleep(0.01)
+        if state.get("ExitCode") != 0:
+            raise RuntimeError(f"Command {command[0]} failed in the container with exit code {state.get('ExitCode')}")
+
+    def put_source_files(self, container, files: Dict[str, str]):
+        """
+        Inject the source files of a run into its started container, without touching the disk of the host
+        :param container: The container
+        :param files: Mapping of paths relative to the working directory to file contents
+        """
+        source_archive = create_tar_archive(files)
+        if sandbox_scheduler.tmpfs_enabled:
+            # The archive API of Docker does not reach into tmpfs mounts, tar unpacks it inside the container
+            self.exec_with_input(container, ["tar", "-x", "-C", self.WORKDIR], source_archive)
+        else:
+            container.put_archive(self.WORKDIR, source_archive)
 
-                with open(file_path, "w") as file:
-                    file.write(code)
-                    if test_code:
-                        file.write("\n\n")
-                        file.write(test_code)
+    def open_file_from_container(self, container, path: str):
+        """
+        Open a file of a container for reading while it streams in
+        :param container: The container
+        :param path: Absolute path of the file in the container
+        :return: Context manager yielding a binary file object
+        """
+        if sandbox_scheduler.tmpfs_enabled:
+            return self.open_file_with_exec(container, path)
+        bits, _ = container.get_archive(path)
+        return open_archive_member(bits)
 
-                dockerfile_content = self.get_dockerfile_content(unique_filename)
-                dockerfile_path = os.path.join(temp_dir, "Dockerfile")
+    @contextmanager
+    def open_file_with_exec(self, container, path: str):
+        # The archive API of Docker does not reach into tmpfs mounts, the file is read with cat instead
+        output = container.client.api.exec_start(
+            container.client.api.exec_create(container.id, ["cat", path])["Id"], stream=True, demux=True
+        )
+        stream = io.BufferedReader(ChunkReader(stdout for stdout, _ in output if stdout), buffer_size=64 * 1024)
+        if not stream.peek(1):
+            raise FileNotFoundError(f"{path} not found in the container")
+        yield stream
 
-                with open(dockerfile_path, "w") as dockerfile:
-                    dockerfile.write(dockerfile_content)
+    def collect_test_results(self, container, filename: str, test_code: str) -> Dict[str, Any]:
+        with self.open_file_from_container(container, f"{self.WORKDIR}/test_results.json") as json_file:
+            return self.format_test_report(json.load(json_file))
 
-                build_start_time = time.time()
-                image, _ = self.docker_client.images.build(
-                    path=temp_dir, tag="code_test_image"
+    def get_container_name(self, kind: str = "run") -> str:
+        # Every run gets its own container, concurrent runs never share a name, image tag or file
+        return f"test2code-{kind}-{self.LANGUAGE}-{uuid.uuid4().hex[:16]}"
+
+    def create_container(self, command):
+        for attempt in range(2):
+            image_id = runner_images.get_image(self)
+            try:
+                return self.docker_client.containers.create(
+                    image=image_id,
+                    command=command,
+                    working_dir=self.WORKDIR,
+                    name=self.get_container_name(),
+                    **self.get_container_options()
                 )
-                build_time = (time.time() - build_start_time) * 1000
+            except ImageNotFound:
+                if attempt:
+                    raise
+                # The runner image was removed from the host since it was cached, build it again
+                self.logger.info("Runner image disappeared from the Docker host, rebuilding")
+                runner_images.invalidate(self)
+
+    def run_code_in_pooled_container(self, code: str, test_code: str, max_failures: int = None,
+                                     only_tests: List[str] = None, on_test_result=None,
+                                     cancellation: RunCancellation = None) -> Dict[str, Any]:
+        self.logger.info(f"Running code in pooled container, code length: {len(code)}, test_code length: {len(test_code)}")
+        try:
+            unique_filename = self.get_filename()
 
-                run_start_time = time.time()
-                container = self.docker_client.containers.run(
-                    image="code_test_image",
-                    command=self.get_run_command(unique_filename),
-                    detach=True,
+            build_start_time = time.time()
+            with container_pool.checkout(self) as container:
+                # A cancelled run kills the container, the pool replaces it
+                result = self.run_in_started_container(
+                    container, unique_filename, code, test_code, build_start_time, max_failures, only_tests,
+                    on_test_result, cancellation
                 )
-                container.wait()
-                run_time = (time.time() - run_start_time) * 1000
-
-                # Extract the JSON content from the tar archive
-                bits, _ = container.get_archive("/app/test_results.json")
-                tar_stream = io.BytesIO()
-                for chunk in bits:
-                    tar_stream.write(chunk)
-                tar_stream.seek(0)
-
-                with tarfile.open(fileobj=tar_stream) as tar:
-                    json_file = tar.extractfile("test_results.json")
-                    json_content = json_file.read().decode("utf-8")
-
-                test_results = self.parse_test_results(json_content)
-
-                container.remove()
-                self.docker_client.images.remove(image.id, force=True)
-
-                self.logger.info("Successfully ran code in container")
-                return {
-                    "test_results": test_results,
-                    "build_time": build_time,
-                    "run_time": run_time,
-                    "total_time": build_time + run_time,
-                }
+            self.logger.info("Successfully ran code in pooled container")
+            return result
+        except RunCancelledError as e:
+            self.logger.info(str(e))
+            return {"error": str(e)}
+        except Exception as e:
+            self.logger.error(f"Error running code in pooled container: {str(e)}")
+            return {"error": str(e)}
+
+    def run_code_in_workspace_container(self, code: str, test_code: str, max_failures: int = None,
+                                        only_tests: List[str] = None, on_test_result=None,
+                                        cancellation: RunCancellation = None) -> Dict[str, Any]:
+        """
+        Run the code in a new container whose workspace is a tmpfs. A tmpfs is only mounted once the
+        container started, so the container idles while the sources are injected and the tests are exec'd.
+        """
+        self.logger.info(f"Running code in container with tmpfs workspace, code length: {len(code)}, test_code length: {len(test_code)}")
+        container = None
+        try:
+            unique_filename = self.get_filename()
+            build_start_time = time.time()
+            container = self.create_container(["sleep", "infinity"])
+            container.start()
+            result = self.run_in_started_container(
+                container, unique_filename, code, test_code, build_start_time, max_failures, only_tests,
+                on_test_result, cancellation
+            )
+            self.logger.info("Successfully ran code in container")
+            return result
+        except RunCancelledError as e:
+            self.logger.info(str(e))
+            return {"error": str(e)}
         except Exception as e:
             self.logger.error(f"Error running code in container: {str(e)}")
             return {"error": str(e)}
+        finally:
+            if container is not None:
+                try:
+                    container.remove(force=True)
+                except DockerException as e:
+                    self.logger.error(f"Error removing container: {str(e)}")
+
+    def run_in_started_container(self, container, unique_filename: str, code: str, test_code: str,
+                                 build_start_time: float, max_failures: int = None, only_tests: List[str] = None,
+                                 on_test_result=None, cancellation: RunCancellation = None) -> Dict[str, Any]:
+        """
+        Inject the sources into a started container, exec the tests and read their results
+        :param build_start_time: Start of the run, the build time includes getting the container
+        :param cancellation: Kills the container when the run is cancelled
+        :return: Test results and timings
+        :raises Exception: If the run fails, was killed or cancelled
+        """
+        cancellation = cancellation or RunCancellation()
+        with tracer.span("build", **self.get_span_attributes()):
+            self.put_source_files(container, self.get_source_files(unique_filename, code, test_code))
+        build_time = (time.time() - build_start_time) * 1000
+
+        run_start_time = time.time()
+        with tracer.span("run", **self.get_span_attributes()), \
+                cancellation.on_cancel(partial(self.kill_container, container)):
+            cancellation.raise_if_cancelled()
+            exit_code = self.exec_with_timeout(
+                container, self.get_run_command(unique_filename, max_failures, only_tests), on_test_result
+            )
+        run_time = (time.time() - run_start_time) * 1000
+        cancellation.raise_if_cancelled()
+        if exit_code == sandbox_scheduler.KILLED_EXIT_CODE:
+            # Raising recycles a pooled container, processes the tests started may still be running in it
+            raise self.get_kill_error(run_time / 1000)
+
+        extract_start_time = time.time()
+        with tracer.span("parse", **self.get_span_attributes()):
+            test_results = self.collect_test_results(container, unique_filename, test_code)
+        extract_time = (time.time() - extract_start_time) * 1000
+
+        return {
+            "test_results": test_results,
+            "build_time": build_time,
+            "run_time": run_time,
+            "extract_time": extract_time,
+            "total_time": build_time + run_time,
+        }
+
+    def exec_with_timeout(self, container, command, on_test_result=None) -> int:
+        """
+        Run the test command in a started container, killed after the run timeout of the sandbox
+        :param container: The container
+        :param command: The test command
+        :param on_test_result: Called with name and outcome of every test as it finishes
+        :return: Exit code of the command
+        """
+        api = container.client.api
+        exec_id = api.exec_create(
+            container.id, sandbox_scheduler.get_timeout_command(self.LANGUAGE, command), workdir=self.WORKDIR
+        )["Id"]
+        output = api.exec_start(exec_id, stream=on_test_result is not None)
+        if on_test_result is not None:
+            self.stream_test_progress(output, on_test_result)
+        return api.exec_inspect(exec_id)["ExitCode"]
+
+    def kill_container(self, container):
+        try:
+            container.kill()
+        except DockerException as e:
+            # The container already exited
+            self.logger.debug(f"Error killing container: {str(e)}")
+
+    def get_kill_error(self, run_seconds: float) -> Exception:
+        """
+        Get the error of a run that was killed, by the timeout when it ran that long, otherwise by the
+        out-of-memory killer
+        """
+        timeout = sandbox_scheduler.get_run_timeout(self.LANGUAGE)
+        if run_seconds >= timeout:
+            sandbox_scheduler.record_timeout(self.LANGUAGE)
+            return SandboxTimeoutError(f"Test run timed out after {timeout} seconds")
+        return self.get_out_of_memory_error()
+
+    def get_out_of_memory_error(self) -> MemoryError:
+        """
+        Get the error of a run that was killed by the out-of-memory killer
+        """
+        sandbox_scheduler.record_out_of_memory(self.LANGUAGE)
+        return MemoryError(f"Test run was killed after exceeding the memory limit of "
+                           f"{sandbox_scheduler.get_limit(self.LANGUAGE, 'memory_mb')} MB")
+
+    def get_span_attributes(self) -> Dict[str, Any]:
+        return {"language": self.LANGUAGE, "version": self.version}
+
+    def get_runtime_id(self) -> str:
+        """
+        Get an identifier of the runtime the tests run in, part of the execution cache key
+        :return: Id of the runner image
+        """
+        return runner_images.get_image(self)
+
+    def get_execution_cache_key(self, code: str, test_code: str, max_failures: int = None,
+                                only_tests: List[str] = None):
+        try:
+            run_mode = f"max_failures={max_failures};only_tests={','.join(only_tests or [])}"
+            return execution_cache.get_key(f"{self.get_runtime_id()};{run_mode}", code, test_code)
+        except Exception as e:
+            # The run reports the error, it just is not cached
+            self.logger.error(f"Error resolving runner image for the execution cache: {str(e)}")
+            return None
+
+    def run_code_in_container(self, code: str, test_code: str, use_cache: bool = True, max_failures: int = None,
+                              only_tests: List[str] = None, on_test_result=None,
+                              cancellation: RunCancellation = None) -> Dict[str, Any]:
+        """
+        Run the code and its tests, reusing the result of an identical earlier run.
+        The run limiter is not applied here, it is taken by run_code_in_container_async on the event loop.
+        :param code: Source code
+        :param test_code: Test code
+        :param use_cache: Set to False for flaky or time-dependent tests that must really run
+        :param max_failures: Stop the run after this many failing tests
+        :param only_tests: Run only these tests (ids from get_test_id)
+        :param on_test_result: Callable called with name and outcome of every test as it finishes,
+                               where the runner reports progress
+        :param cancellation: Stops the run from another thread, e.g. once another candidate passed
+        :return: Test results and timings, or an error
+        """
+        cache_key = None
+        if use_cache and execution_cache.enabled:
+            cache_key = self.get_execution_cache_key(code, test_code, max_failures, only_tests)
+            if cache_key is not None:
+                cached_result = execution_cache.get(cache_key)
+                observe_cache("execution", cached_result is not None, self.LANGUAGE, self.version)
+                if cached_result is not None:
+                    self.logger.info("Returning cached container run result")
+                    return cached_result
+
+        try:
+            with sandbox_scheduler.admit(self.LANGUAGE):
+                # The run may have been cancelled while it waited for its admission
+                if cancellation is not None and cancellation.cancelled:
+                    self.logger.info("Test run was cancelled before it started")
+                    return {"error": "Test run was cancelled"}
+                result = self.execute_code(code, test_code, max_failures, only_tests, on_test_result, cancellation)
+        except SandboxCapacityError as e:
+            self.logger.error(str(e))
+            return {"error": str(e)}
+
+        if "error" not in result:
+            observe_container_run(self.LANGUAGE, self.version, result)
+        if cache_key is not None and "error" not in result:
+            execution_cache.set(cache_key, result)
+        return result
+
+    def execute_code(self, code: str, test_code: str, max_failures: int = None, only_tests: List[str] = None,
+                     on_test_result=None, cancellation: RunCancellation = None) -> Dict[str, Any]:
+        """
+        Run the code and its tests in the execution backend of the service
+        :param code: Source code
+        :param test_code: Test code
+        :param cancellation: Stops the run, a cancelled run returns an error
+        :return: Test results and timings, or an error
+        """
+        if container_pool.enabled:
+            return self.run_code_in_pooled_container(
+                code, test_code, max_failures, only_tests, on_test_result, cancellation
+            )
+        if sandbox_scheduler.tmpfs_enabled:
+            return self.run_code_in_workspace_container(
+                code, test_code, max_failures, only_tests, on_test_result, cancellation
+            )
+        return self.run_code_in_new_container(code, test_code, max_failures, only_tests, on_test_result, cancellation)
+
+    def run_code_in_new_container(self, code: str, test_code: str, max_failures: int = None,
+                                  only_tests: List[str] = None, on_test_result=None,
+                                  cancellation: RunCancellation = None) -> Dict[str, Any]:
+        self.logger.info(f"Running code in container, code length: {len(code)}, test_code length: {len(test_code)}")
+        cancellation = cancellation or RunCancellation()
+        container = None
+        try:
+            unique_filename = self.get_filename()
+
+            build_start_time = time.time()
+            with tracer.span("build", **self.get_span_attributes()):
+                container = self.create_container(self.get_run_command(unique_filename, max_failures, only_tests))
+                source_archive = create_tar_archive(self.get_source_files(unique_filename, code, test_code))
+                container.put_archive(self.WORKDIR, source_archive)
+            build_time = (time.time() - build_start_time) * 1000
+
+            timeout = sandbox_scheduler.get_run_timeout(self.LANGUAGE)
+            timed_out = threading.Event()
+
+            def on_timeout():
+                # Killing the container also ends the log stream and the wait below
+                timed_out.set()
+                self.kill_container(container)
+
+            run_start_time = time.time()
+            timer = threading.Timer(timeout, on_timeout)
+            with tracer.span("run", **self.get_span_attributes()), \
+                    cancellation.on_cancel(partial(self.kill_container, container)):
+                cancellation.raise_if_cancelled()
+                container.start()
+                timer.start()
+                try:
+                    if on_test_result is not None:
+                        self.stream_test_progress(container.logs(stream=True, follow=True), on_test_result)
+                    # The bound only matters if the kill failed, the Docker client would wait forever otherwise
+                    container.wait(timeout=timeout + 30)
+                finally:
+                    timer.cancel()
+            run_time = (time.time() - run_start_time) * 1000
+
+            cancellation.raise_if_cancelled()
+            if timed_out.is_set():
+                sandbox_scheduler.record_timeout(self.LANGUAGE)
+                self.logger.error(f"Test run timed out after {timeout} seconds")
+                return {"error": f"Test run timed out after {timeout} seconds"}
+            container.reload()
+            if container.attrs.get("State", {}).get("OOMKilled"):
+                error = self.get_out_of_memory_error()
+                self.logger.error(str(error))
+                return {"error": str(error)}
+
+            extract_start_time = time.time()
+            with tracer.span("parse", **self.get_span_attributes()):
+                test_results = self.collect_test_results(container, unique_filename, test_code)
+            extract_time = (time.time() - extract_start_time) * 1000
+
+            self.logger.info("Successfully ran code in container")
+            return {
+                "test_results": test_results,
+                "build_time": build_time,
+                "run_time": run_time,
+                "extract_time": extract_time,
+                "total_time": build_time + run_time,
+            }
+        except RunCancelledError as e:
+            self.logger.info(str(e))
+            return {"error": str(e)}
+        except Exception as e:
+            self.logger.error(f"Error running code in container: {str(e)}")
+            return {"error": str(e)}
+        finally:
+            if container is not None:
+                try:
+                    container.remove(force=True)
+                except DockerException as e:
+                    self.logger.error(f"Error removing container: {str(e)}")
+
+    async def run_code_in_container_async(self, code: str, test_code: str, use_cache: bool = True,
+                                          max_failures: int = None, only_tests: List[str] = None,
+                                          on_test_result=None, cancellation: RunCancellation = None) -> Dict[str, Any]:
+        """
+        Run the code in a container without blocking the event loop
+        :param code: Source code
+        :param test_code: Test code
+        :param use_cache: Whether an identical earlier run may be reused
+        :param on_test_result: Called from the executor thread, see run_code_in_container
+        :param cancellation: Stops the run in the executor thread, cancelling the awaiting task does not
+        :return: Same result as run_code_in_container
+        """
+        # The run takes its slots before it gets an executor thread, waiting runs hold no thread
+        async with run_limiter.limit(self.LANGUAGE):
+            return await run_in_container_executor(
+                self.run_code_in_container, code, test_code, use_cache, max_failures, only_tests, on_test_result,
+                cancellation
+            )
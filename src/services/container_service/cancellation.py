@@ -0,0 +1,62 @@
+# cancellation.py
+
+import threading
+from contextlib import contextmanager
+from typing import Callable, List
+
+
+class RunCancelledError(RuntimeError):
+    """
+    A test run was cancelled before it finished
+    """
+
+
+class RunCancellation:
+    """
+    Cancels a test run from another thread. While the run executes it registers how to stop the work it
+    started, e.g. killing its container, and cancel() calls these callbacks. A run cancelled before it
+    started does not start at all.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self):
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+
+    @contextmanager
+    def on_cancel(self, callback: Callable[[], None]):
+        """
+        Call the callback when the run is cancelled while the context is active, right away if it already was
+        """
+        with self._lock:
+            cancelled = self._cancelled
+            if not cancelled:
+                self._callbacks.append(callback)
+        if cancelled:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        """
+        :raises RunCancelledError: If the run was cancelled
+        """
+        if self._cancelled:
+            raise RunCancelledError("Test run was cancelled")
@@ -0,0 +1,59 @@
+# concurrency.py
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Dict
+
+
+class ConcurrencyLimiter:
+    """
+    Bounds the number of test runs executing at the same time, globally and per language.
+    The slots are taken on the event loop before a run is handed to the container executor, so runs waiting
+    for a slot hold no executor thread: a saturated language cannot starve the other languages of threads,
+    and a run cancelled while it waits simply stops waiting.
+    """
+
+    def __init__(self, max_runs: int = 8):
+        self.max_runs = max_runs
+        self.language_limits: Dict[str, int] = {}
+        self._global = asyncio.Semaphore(max_runs)
+        self._languages: Dict[str, asyncio.Semaphore] = {}
+        self.active_runs = 0
+        self.peak_active_runs = 0
+
+    def configure_from_env(self, languages):
+        """
+        Read MAX_CONCURRENT_RUNS and MAX_CONCURRENT_RUNS_<LANGUAGE> (e.g. MAX_CONCURRENT_RUNS_JAVA)
+        """
+        self.max_runs = int(os.getenv("MAX_CONCURRENT_RUNS", str(self.max_runs)))
+        self._global = asyncio.Semaphore(self.max_runs)
+        self.language_limits = {}
+        self._languages = {}
+        for language in languages:
+            limit = os.getenv(f"MAX_CONCURRENT_RUNS_{language.upper()}")
+            if limit:
+                self.language_limits[language] = int(limit)
+                self._languages[language] = asyncio.Semaphore(int(limit))
+
+    @asynccontextmanager
+    async def limit(self, language: str):
+        language_semaphore = self._languages.get(language)
+        # Take the language slot first, so a saturated language does not hold global slots while waiting
+        if language_semaphore is not None:
+            await language_semaphore.acquire()
+        try:
+            async with self._global:
+                # The counters are only changed on the event loop, no lock needed
+                self.active_runs += 1
+                self.peak_active_runs = max(self.peak_active_runs, self.active_runs)
+                try:
+                    yield
+                finally:
+                    self.active_runs -= 1
+        finally:
+            if language_semaphore is not None:
+                language_semaphore.release()
+
+
+run_limiter = ConcurrencyLimiter()
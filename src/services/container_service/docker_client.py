@@ -0,0 +1,113 @@
+# docker_client.py
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict
+
+import docker
+from docker.errors import DockerException
+
+
+class DockerClientProvider:
+    """
+    Application-lifetime Docker client shared by all services.
+    The client is health-checked with a ping at most every health_check_interval seconds and
+    reconnected when the daemon stopped answering, so requests keep their HTTP connections alive.
+    """
+
+    def __init__(self, max_pool_size: int = 32, health_check_interval: float = 30, timeout: float = 120,
+                 logger=None):
+        self.max_pool_size = max_pool_size
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.connects = 0
+        self.health_check_failures = 0
+
+        self._client = None
+        self._last_health_check = 0.0
+        self._lock = threading.Lock()
+
+    def configure_from_env(self):
+        self.max_pool_size = int(os.getenv("DOCKER_MAX_POOL_SIZE", str(self.max_pool_size)))
+        self.health_check_interval = float(os.getenv("DOCKER_HEALTH_CHECK_INTERVAL", str(self.health_check_interval)))
+        self.timeout = float(os.getenv("DOCKER_TIMEOUT", str(self.timeout)))
+
+    def _connect(self, logger):
+        try:
+            client = docker.from_env(max_pool_size=self.max_pool_size, timeout=self.timeout)
+        except DockerException as e:
+            logger.error(f"Error connecting to Docker: {str(e)}")
+            raise ValueError(f"Error connecting to Docker (Docker running and configured correctly?): {str(e)}")
+        self.connects += 1
+        self._last_health_check = time.time()
+        return client
+
+    def _close_client(self):
+        try:
+            self._client.close()
+        except Exception as e:
+            self.logger.error(f"Error closing Docker client: {str(e)}")
+        self._client = None
+
+    def get(self, logger=None):
+        """
+        Get the shared Docker client, connecting or reconnecting if needed
+        :param logger: Logger of the calling request
+        :return: The Docker client
+        """
+        logger = logger or self.logger
+        with self._lock:
+            if self._client is not None and time.time() - self._last_health_check > self.health_check_interval:
+                try:
+                    self._client.ping()
+                    self._last_health_check = time.time()
+                except Exception as e:
+                    self.health_check_failures += 1
+                    logger.error(f"Docker health check failed, reconnecting: {str(e)}")
+                    self._close_client()
+            if self._client is None:
+                self._client = self._connect(logger)
+            return self._client
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._close_client()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Utilization of the HTTP connection pools of the client (one pool per Docker host)
+        """
+        with self._lock:
+            client = self._client
+        pools = []
+        if client is not None:
+            for adapter in client.api.adapters.values():
+                adapter_pools = getattr(adapter, "pools", None)
+                if adapter_pools is None:
+                    continue
+                # The pool container of urllib3 refuses iteration, keys() returns a locked copy
+                for key in adapter_pools.keys():
+                    pool = adapter_pools.get(key)
+                    if pool is None:
+                        continue
+                    pools.append({
+                        "connections": pool.num_connections,
+                        "requests": pool.num_requests,
+                        "idle": pool.pool.qsize() if pool.pool is not None else 0,
+                        "max_size": pool.pool.maxsize if pool.pool is not None else 0,
+                    })
+        return {
+            "connected": client is not None,
+            "connects": self.connects,
+            "health_check_failures": self.health_check_failures,
+            "max_pool_size": self.max_pool_size,
+            "pools": pools,
+        }
+
+
+docker_clients = DockerClientProvider()
@@ -0,0 +1,73 @@
+# execution_cache.py
+
+import copy
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class ExecutionCache:
+    """
+    Memoizes container runs. A run is deterministic for the same code, tests and runner image,
+    so a revision that reproduces an implementation that already ran does not need Docker.
+    """
+
+    def __init__(self, max_entries: int = 500):
+        self.enabled = True
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure_from_env(self):
+        self.enabled = os.getenv("EXECUTION_CACHE_ENABLED", "true").lower() == "true"
+        self.max_entries = int(os.getenv("EXECUTION_CACHE_MAX_ENTRIES", str(self.max_entries)))
+
+    @staticmethod
+    def get_key(image_id: str, code: str, test_code: str) -> str:
+        digest = hashlib.sha256()
+        for part in (image_id, code, test_code or ""):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        result = copy.deepcopy(result)
+        result["cached"] = True
+        return result
+
+    def set(self, key: str, result: Dict[str, Any]):
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+execution_cache = ExecutionCache()
@@ -0,0 +1,25 @@
+# executor.py
+
+import asyncio
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# docker-py is blocking, so all container work runs on this bounded pool instead of the event loop
+container_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CONTAINER_EXECUTOR_WORKERS", "8")),
+    thread_name_prefix="container",
+)
+
+
+async def run_in_container_executor(func, *args, **kwargs):
+    """
+    Run a blocking container operation on the container executor
+    :param func: The blocking callable
+    :return: The result of the callable
+    """
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the caller's context, so spans in the thread belong to the request's trace
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(container_executor, partial(context.run, func, *args, **kwargs))
@@ -1,7 +1,10 @@
 # factory.py
 
 from .base import ContainerService
+from .executor import run_in_container_executor
+from .image_registry import runner_images
 from .java_service import JavaContainerService
+from .local_python_service import LocalPythonService
 from .python_service import PythonContainerService
 
 SERVICE_CLASSES = {
@@ -10,14 +13,28 @@ SERVICE_CLASSES = {
     # Add more languages here in the future
 }
 
-def get_container_service(language: str, version: str, logger) -> ContainerService:
+def get_service_class(language: str, version: str):
+    """
+    Get the service class that runs tests of a language and version, None for unsupported languages
+    """
     service_class = SERVICE_CLASSES.get(language.lower())
+    if service_class is PythonContainerService and LocalPythonService.supports(version):
+        # The server's own interpreter matches, run the tests without a Docker round trip
+        return LocalPythonService
+    return service_class
+
+def get_container_service(language: str, version: str, logger, docker_client=None) -> ContainerService:
+    service_class = get_service_class(language, version)
     if service_class:
-        return service_class(version, logger)
+        return service_class(version, logger, docker_client)
     else:
         logger.error(f"Unsupported language: {language}")
         raise ValueError(f"Unsupported language: {language}")
 
+async def get_container_service_async(language: str, version: str, logger, docker_client=None) -> ContainerService:
+    # Creating a service connects to the Docker daemon, which blocks
+    return await run_in_container_executor(get_container_service, language, version, logger, docker_client)
+
 def get_supported_languages():
     return list(SERVICE_CLASSES.keys())
 
@@ -27,3 +44,15 @@ def get_language_versions(language: str):
         return service_class.get_supported_versions()
     else:
         return None
+
+def prebuild_runner_images(logger):
+    """
+    Build the runner images of all supported languages and versions, so the first
+    request for a runtime does not have to wait for the image build
+    """
+    for language, service_class in SERVICE_CLASSES.items():
+        for version in service_class.get_supported_versions():
+            try:
+                runner_images.get_image(service_class(version, logger))
+            except Exception as e:
+                logger.error(f"Error building runner image for {language} {version}: {str(e)}")
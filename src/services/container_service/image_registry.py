@@ -0,0 +1,107 @@
+# image_registry.py
+
+import hashlib
+import io
+import threading
+import time
+from typing import Dict
+
+from docker.errors import ImageNotFound
+
+from services.metrics_service import observe_image_build
+
+from .archive import create_tar_archive
+
+
+class RunnerImageRegistry:
+    """
+    Keeps one runner image per (language, version) across requests.
+    Runner images only contain the language toolchain and test dependencies; user code is
+    injected into the container at run time. Images are tagged with a hash of their build
+    context, so a changed Dockerfile or pom produces a new image instead of reusing a stale one.
+    """
+
+    IMAGE_REPOSITORY = "test2code-runner"
+    HASH_LABEL = "test2code.content-hash"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tag_locks: Dict[str, threading.Lock] = {}
+        self._images: Dict[str, str] = {}
+
+    @staticmethod
+    def get_build_context(service) -> Dict[str, bytes]:
+        context = {"Dockerfile": service.get_runner_dockerfile_content().encode("utf-8")}
+        context.update(service.get_runner_context_files())
+        return context
+
+    @staticmethod
+    def get_content_hash(context: Dict[str, bytes]) -> str:
+        digest = hashlib.sha256()
+        for name in sorted(context):
+            digest.update(name.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(context[name])
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def format_tag(self, service, content_hash: str) -> str:
+        return f"{self.IMAGE_REPOSITORY}:{service.LANGUAGE}-{service.version}-{content_hash[:16]}"
+
+    def get_image_tag(self, service) -> str:
+        return self.format_tag(service, self.get_content_hash(self.get_build_context(service)))
+
+    def _get_tag_lock(self, tag: str) -> threading.Lock:
+        with self._lock:
+            return self._tag_locks.setdefault(tag, threading.Lock())
+
+    def get_image(self, service) -> str:
+        """
+        Return the id of the runner image for the given service, building it on first use
+        :param service: The container service the image is for
+        :return: Id of the runner image
+        """
+        context = self.get_build_context(service)
+        content_hash = self.get_content_hash(context)
+        tag = self.format_tag(service, content_hash)
+
+        image_id = self._images.get(tag)
+        if image_id:
+            return image_id
+
+        # Only one thread builds a given image, the others wait and reuse it
+        with self._get_tag_lock(tag):
+            image_id = self._images.get(tag)
+            if image_id:
+                return image_id
+
+            try:
+                image = service.docker_client.images.get(tag)
+                if image.labels.get(self.HASH_LABEL) != content_hash:
+                    raise ImageNotFound(f"Image {tag} has a mismatching content hash")
+                service.logger.info(f"Reusing existing runner image {tag}")
+            except ImageNotFound:
+                service.logger.info(f"Building runner image {tag}")
+                build_start_time = time.time()
+                image, _ = service.docker_client.images.build(
+                    fileobj=io.BytesIO(create_tar_archive(context)),
+                    custom_context=True,
+                    tag=tag,
+                    labels={self.HASH_LABEL: content_hash},
+                    rm=True,
+                )
+                build_time = (time.time() - build_start_time) * 1000
+                observe_image_build(service.LANGUAGE, service.version, build_time / 1000)
+                service.logger.info(f"Built runner image {tag} in {build_time:.0f} ms")
+
+            self._images[tag] = image.id
+            return image.id
+
+    def invalidate(self, service):
+        """
+        Forget the cached image of a service, e.g. after it was removed from the Docker host
+        """
+        self._images.pop(self.get_image_tag(service), None)
+
+
+runner_images = RunnerImageRegistry()
@@ -0,0 +1,9 @@
+import org.junit.jupiter.api.Test;
+
+// Compiled and run once while the runner image is built, so Maven resolves every plugin
+// and surefire provider into the local repository of the image and test runs can be offline.
+public class WarmupTest {
+    @Test
+    public void warmup() {
+    }
+}
@@ -2,21 +2,32 @@
 
 import io
 import os
-import shutil
-import tarfile
-import tempfile
-import time
+import re
 import xml.etree.ElementTree as ET
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
 from .base import ContainerService
 
 
 class JavaContainerService(ContainerService):
+    LANGUAGE = "java"
     SUPPORTED_VERSIONS = ["11", "17"]
-
-    def __init__(self, version: str = "11", logger=None):
-        super().__init__(version, logger)
+    RUNNERS = ["maven", "console"]
+    # Matches the JUnit Jupiter 5.8.2 dependency of the pom files
+    JUNIT_PLATFORM_VERSION = "1.8.2"
+    JUNIT_CONSOLE_JAR = f"/opt/junit/junit-platform-console-standalone-{JUNIT_PLATFORM_VERSION}.jar"
+    # Outside of /root/.m2, which older Maven base images declare as a volume that would drop the baked layer
+    MAVEN_REPOSITORY = "/opt/m2/repository"
+    # Test method lines of the console launcher's tree output, e.g. "│  ├─ testAdd() ✔", in the unicode theme or
+    # in the ascii theme the launcher falls back to without a UTF-8 locale, e.g. "|  +-- testAdd() [OK]"
+    CONSOLE_PROGRESS_LINE_PATTERN = re.compile(r'^[\s│├└─|+\'-]*(\w+\([^)]*\))\s+(✔|✘|↷|■|\[OK\]|\[X\]|\[S\]|\[A\])')
+    CONSOLE_OUTCOMES = {"✔": "passed", "[OK]": "passed", "✘": "failed", "[X]": "failed",
+                        "↷": "skipped", "[S]": "skipped", "■": "skipped", "[A]": "skipped"}
+    # Contents of the runner build context files by pom file, shared by all instances
+    _runner_context_files: Dict[str, Dict[str, bytes]] = {}
+
+    def __init__(self, version: str = "11", logger=None, docker_client=None):
+        super().__init__(version, logger, docker_client)
         if not self.version:
             self.version = "11"  # default to 11 if version is None
 
@@ -28,25 +39,36 @@ class JavaContainerService(ContainerService):
                 f"Unsupported Java version: {self.version}. Supported versions are: {', '.join(self.SUPPORTED_VERSIONS)}"
             )
 
+        self.runner = os.getenv("JAVA_RUNNER", "maven").lower()
+        if self.runner not in self.RUNNERS:
+            self.logger.error(f"Unsupported Java runner: {self.runner}. Supported runners are: {', '.join(self.RUNNERS)}")
+            raise ValueError(f"Unsupported Java runner: {self.runner}. Supported runners are: {', '.join(self.RUNNERS)}")
+
     @classmethod
     def get_supported_versions(cls):
         return cls.SUPPORTED_VERSIONS
 
-    def get_dockerfile_content(self, filename: str) -> str:
+    def get_pom_file(self) -> str:
+        if self.version == "11":
+            return "java11pom.xml"
+        elif self.version == "17":
+            return "java17pom.xml"
+        raise ValueError(f"Unsupported Java version: {self.version}")
+
+    def get_runner_dockerfile_content(self) -> str:
         """
-        Return Dockerfile content for Java with JUnit support for a specific Java version.
-        This Dockerfile will use an OpenJDK base image for the specified Java version, install JUnit,
-        copy the Java source code to the container, compile and run it.
+        Return Dockerfile content for the Java runner image of a specific Java version.
+        This Dockerfile will use a Maven base image for the specified Java version and the pom with JUnit support.
+        A warmup build fills the local Maven repository of the image, so test runs work offline, and the
+        JUnit console launcher is added for the javac based runner.
+        The test class is injected into the container at run time.
 
-        :param filename: The name of the Java source file (without extension).
         :return: Dockerfile content as a string.
         """
 
         if self.version == "11":
-            pom_file = "java11pom.xml"
             image_version = "3.8.1-adoptopenjdk-11"
         elif self.version == "17":
-            pom_file = "java17pom.xml"
             image_version = "3.8.1-openjdk-17-slim"
         else:
             raise ValueError(f"Unsupported Java version: {self.version}")
@@ -55,15 +77,67 @@ class JavaContainerService(ContainerService):
         FROM maven:{image_version}
 
         WORKDIR /app
-        COPY {pom_file} /app/pom.xml
+        COPY pom.xml /app/pom.xml
 
         RUN mkdir -p src/test/java/com/example
-
-        COPY {filename}.java src/test/java/com/example/{filename}.java
+        COPY WarmupTest.java src/test/java/com/example/WarmupTest.java
+        RUN mvn -B -q -Dmaven.repo.local={self.MAVEN_REPOSITORY} test \\
+            && mvn -B -q -Dmaven.repo.local={self.MAVEN_REPOSITORY} dependency:copy \\
+                -Dartifact=org.junit.platform:junit-platform-console-standalone:{self.JUNIT_PLATFORM_VERSION} \\
+                -DoutputDirectory=/opt/junit \\
+            && rm -rf target src/test/java/com/example/WarmupTest.java
         """
 
-    def get_run_command(self) -> str:
-        return "mvn clean test"
+    def get_runner_context_files(self) -> Dict[str, bytes]:
+        # The image registry hashes the build context on every run, the files are read once per pom
+        pom_file_name = self.get_pom_file()
+        context_files = self._runner_context_files.get(pom_file_name)
+        if context_files is None:
+            java_dir = os.path.join(os.path.dirname(__file__), 'java')
+            with open(os.path.join(java_dir, pom_file_name), "rb") as pom_file:
+                pom = pom_file.read()
+            with open(os.path.join(java_dir, "WarmupTest.java"), "rb") as warmup_file:
+                warmup_test = warmup_file.read()
+            context_files = {"pom.xml": pom, "WarmupTest.java": warmup_test}
+            JavaContainerService._runner_context_files[pom_file_name] = context_files
+        return dict(context_files)
+
+    def get_run_command(self, filename: str, max_failures: int = None, only_tests: List[str] = None):
+        if self.runner == "console":
+            # Skips Maven entirely: compile the test class and run it with the JUnit console launcher.
+            # Console launcher 1.8 has no fail-fast option, max_failures only applies to Maven runs.
+            if only_tests:
+                selectors = " ".join(f"--select-method {filename}#{test_id}" for test_id in only_tests)
+            else:
+                selectors = f"--select-class {filename}"
+            return [
+                "sh", "-c",
+                f"mkdir -p target/test-classes target/reports"
+                f" && javac -d target/test-classes -cp {self.JUNIT_CONSOLE_JAR} src/test/java/com/example/{filename}.java"
+                f" && java -jar {self.JUNIT_CONSOLE_JAR} -cp target/test-classes {selectors}"
+                f" --reports-dir target/reports --disable-banner"
+            ]
+        command = f"mvn -o -B -Dmaven.repo.local={self.MAVEN_REPOSITORY}"
+        if max_failures:
+            command += f" -Dsurefire.skipAfterFailureCount={max_failures}"
+        if only_tests:
+            command += f" -Dtest={filename}#{'+'.join(only_tests)} -Dsurefire.failIfNoSpecifiedTests=false"
+        return command + " test"
+
+    def parse_progress_line(self, line: str) -> Optional[Tuple[str, str]]:
+        # Surefire prints no line per test, only the console launcher reports finished tests
+        if self.runner != "console":
+            return None
+        match = self.CONSOLE_PROGRESS_LINE_PATTERN.match(line)
+        if match is None:
+            return None
+        # Same names as in the results of the JUnit report
+        return match.group(1).removesuffix("()"), self.CONSOLE_OUTCOMES[match.group(2)]
+
+    def get_result_file(self, filename: str) -> str:
+        if self.runner == "console":
+            return f"{self.WORKDIR}/target/reports/TEST-junit-jupiter.xml"
+        return f"{self.WORKDIR}/target/test-classes/TEST-{filename}.xml"
 
     def get_file_extension(self) -> str:
         """
@@ -72,23 +146,40 @@ class JavaContainerService(ContainerService):
         return "java"
 
     def format_junit_response(self, xml_content):
-        root = ET.fromstring(xml_content)
-
-        total_tests = int(root.attrib["tests"])
-        failures = int(root.attrib["failures"])
-        errors = int(root.attrib["errors"])
-
-        passed = total_tests - (failures + errors)
-        summary = {
-            "total": total_tests,
-            "passed": passed
-        }
+        return self.parse_junit_report(io.BytesIO(xml_content.encode("utf-8")))
 
+    def parse_junit_report(self, xml_file):
+        """
+        Parse a JUnit XML report incrementally, every testcase element is dropped once it is converted
+        :param xml_file: Binary file object of the report
+        :return: Summary and tests in the same structure as the Python test results
+        """
+        root = None
+        summary = None
         tests = []
 
-        for testcase in root.findall('testcase'):
+        for event, element in ET.iterparse(xml_file, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = element
+                    total_tests = int(root.attrib["tests"])
+                    failures = int(root.attrib["failures"])
+                    errors = int(root.attrib["errors"])
+
+                    passed = total_tests - (failures + errors)
+                    summary = {
+                        "total": total_tests,
+                        "passed": passed
+                    }
+                continue
+
+            if element.tag != 'testcase':
+                continue
+
+            testcase = element
             test_data = {
-                "name": testcase.attrib["name"],
+                # The console launcher reports test methods with parentheses, surefire without
+                "name": testcase.attrib["name"].removesuffix("()"),
                 "outcome": "failed" if testcase.find('failure') is not None else "passed",
                 "duration": testcase.attrib["time"],
                 "call": {
@@ -106,6 +197,7 @@ class JavaContainerService(ContainerService):
                 }
 
             tests.append(test_data)
+            testcase.clear()
 
         return {
             "summary": summary,
@@ -127,75 +219,29 @@ class JavaContainerService(ContainerService):
             }}
 """
 
-    def run_code_in_container(self, code: str, test_code: str) -> Dict[str, Any]:
-        """
-        Run Java code in a Docker container with optional JUnit test code.
-        :param code: Java source code
-        :param test_code: Java test code (optional)
-        :return: Dictionary containing build time, run time, and test results (if any)
-        """
-
-        try:
-            with tempfile.TemporaryDirectory() as temp_dir:
-                java11_pom_path = os.path.join(os.path.dirname(__file__), 'java/java11pom.xml')
-                java17_pom_path = os.path.join(os.path.dirname(__file__), 'java/java17pom.xml')
-
-                shutil.copy(java11_pom_path, temp_dir)
-                shutil.copy(java17_pom_path, temp_dir)
-
-                filename = "TestClass"
-                file_path = os.path.join(temp_dir, f"{filename}.{self.get_file_extension()}")
-
-                javaClass = self.create_java_class(test_code, code, filename)
-
-                with open(file_path, "w") as file:
-                    file.write(javaClass)
-
-                dockerfile_content = self.get_dockerfile_content(filename)
-                dockerfile_path = os.path.join(temp_dir, "Dockerfile")
-                with open(dockerfile_path, "w") as dockerfile:
-                    dockerfile.write(dockerfile_content)
-
-                build_start_time = time.time()
-                image, _ = self.docker_client.images.build(path=temp_dir, tag="java_code_test_image")
-                build_time = (time.time() - build_start_time) * 1000  # in milliseconds
-
-                run_start_time = time.time()
-
-                container = self.docker_client.containers.run(
-                    image="java_code_test_image",
-                    command=self.get_run_command(),
-                    detach=True
-                )
-                container.wait()
-                run_time = (time.time() - run_start_time) * 1000
-
-                test_results = None
-                if test_code:
-                    bits, _ = container.get_archive("/app/target/test-classes/TEST-TestClass.xml")
-                    tar_stream = io.BytesIO()
-                    for chunk in bits:
-                        tar_stream.write(chunk)
-                    tar_stream.seek(0)
-
-                    with tarfile.open(fileobj=tar_stream) as tar:
-                        xml_file = tar.extractfile('TEST-TestClass.xml')
-                        xml_content = xml_file.read().decode('utf-8')
-
-                    test_results = self.format_junit_response(xml_content)
-
-                container.remove()
-                self.docker_client.images.remove(image.id, force=True)
-
-                return {
-                    "test_results": test_results,
-                    "build_time": build_time,
-                    "run_time": run_time,
-                    "total_time": build_time + run_time
-                }
-
-        except Exception as e:
-            return {"error": str(e)}
+    def get_workspace_paths(self) -> List[str]:
+        # The pom of the runner image stays in the working directory, only the test sources and the build output
+        # belong to a run
+        return [f"{self.WORKDIR}/src/test/java/com/example", f"{self.WORKDIR}/target"]
+
+    def get_reset_command(self):
+        # Keep the pom and the source directory of the runner image, drop the test class and build output.
+        # The directories themselves stay, they may be tmpfs mounts.
+        return ["sh", "-c", f"rm -rf {self.WORKDIR}/target/* {self.WORKDIR}/src/test/java/com/example/*"]
+
+    def get_filename(self) -> str:
+        # Every run has its own container, so the class name matching the surefire includes can be fixed
+        return "TestClass"
+
+    def get_source_files(self, filename: str, code: str, test_code: str) -> Dict[str, str]:
+        javaClass = self.create_java_class(test_code, code, filename)
+        return {f"src/test/java/com/example/{filename}.{self.get_file_extension()}": javaClass}
+
+    def collect_test_results(self, container, filename: str, test_code: str) -> Dict[str, Any]:
+        if not test_code:
+            return None
+        with self.open_file_from_container(container, self.get_result_file(filename)) as xml_file:
+            return self.parse_junit_report(xml_file)
 
 
 java_code = """
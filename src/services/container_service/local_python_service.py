@@ -0,0 +1,202 @@
+# local_python_service.py
+
+import importlib.util
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from typing import Dict, Any, List
+
+from services.logging_service import tracer
+
+from .cancellation import RunCancellation, RunCancelledError
+from .python_service import PythonContainerService
+from .sandbox import sandbox_scheduler
+
+
+class LocalPythonService(PythonContainerService):
+    """
+    Runs pytest in a subprocess of the server's own interpreter instead of a Docker container.
+    The subprocess gets a temporary working directory, CPU, memory and file size limits, a
+    wall-clock timeout and, where unprivileged user namespaces are available, no network.
+    Only used when the operator allows it and the requested version matches the interpreter.
+    """
+
+    REQUIRES_DOCKER = False
+    _network_isolation = None
+
+    @staticmethod
+    def get_local_version() -> str:
+        return f"{sys.version_info.major}.{sys.version_info.minor}"
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        return os.getenv("LOCAL_PYTHON_BACKEND_ENABLED", "false").lower() == "true"
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """
+        Check if pytest and the JSON report plugin can be used by the server's interpreter
+        """
+        return (importlib.util.find_spec("pytest") is not None
+                and importlib.util.find_spec("pytest_jsonreport") is not None)
+
+    @staticmethod
+    def is_network_allowed() -> bool:
+        return os.getenv("LOCAL_PYTHON_ALLOW_NETWORK", "false").lower() == "true"
+
+    @classmethod
+    def supports(cls, version: str) -> bool:
+        # Without a network namespace the generated code could reach the network, such runs stay in Docker
+        # unless the operator explicitly allows it
+        return (cls.is_enabled() and version == cls.get_local_version() and cls.is_available()
+                and (bool(cls.get_network_isolation_prefix()) or cls.is_network_allowed()))
+
+    @classmethod
+    def check_network_isolation(cls, logger):
+        """
+        Warn on startup when the local backend is enabled but cannot isolate the network of the test runs
+        """
+        if not cls.is_enabled() or cls.get_network_isolation_prefix():
+            return
+        if cls.is_network_allowed():
+            logger.warning("Network isolation (unshare --net) is not available, local Python test runs have "
+                           "full network access because LOCAL_PYTHON_ALLOW_NETWORK is set")
+        else:
+            logger.warning("Network isolation (unshare --net) is not available, Python tests run in Docker instead "
+                           "of the local backend. Set LOCAL_PYTHON_ALLOW_NETWORK=true to run them locally with "
+                           "network access")
+
+    @classmethod
+    def get_network_isolation_prefix(cls):
+        """
+        Get the command prefix that runs a process in a new network namespace without any interfaces,
+        or an empty list when unprivileged user namespaces are not available on this host
+        """
+        if cls._network_isolation is None:
+            cls._network_isolation = []
+            unshare = shutil.which("unshare")
+            if unshare:
+                prefix = [unshare, "--net", "--map-root-user"]
+                try:
+                    probe = subprocess.run(prefix + ["true"], capture_output=True, timeout=5)
+                    if probe.returncode == 0:
+                        cls._network_isolation = prefix
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+        return cls._network_isolation
+
+    @staticmethod
+    def get_resource_limit_prefix():
+        """
+        Get the command prefix that applies the CPU, memory and file size limits before pytest starts
+        """
+        cpu_seconds = int(os.getenv("LOCAL_PYTHON_BACKEND_CPU_SECONDS", "10"))
+        memory_bytes = int(os.getenv("LOCAL_PYTHON_BACKEND_MEMORY_MB", "1024")) * 1024 * 1024
+        file_size_bytes = int(os.getenv("LOCAL_PYTHON_BACKEND_FILE_SIZE_MB", "16")) * 1024 * 1024
+        launcher = os.path.join(os.path.dirname(__file__), "sandbox_launcher.py")
+        return [sys.executable, launcher, str(cpu_seconds), str(memory_bytes), str(file_size_bytes)]
+
+    def get_runtime_id(self) -> str:
+        return f"local:{sys.version}"
+
+    @staticmethod
+    def get_workspace_root():
+        """
+        Get the directory the temporary workspaces are created in: the shared memory file system when
+        SANDBOX_TMPFS_MB is set and the host has one, otherwise the default temporary directory
+        """
+        if sandbox_scheduler.tmpfs_enabled and os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+            return "/dev/shm"
+        return None
+
+    def execute_code(self, code: str, test_code: str, max_failures: int = None, only_tests: List[str] = None,
+                     on_test_result=None, cancellation: RunCancellation = None) -> Dict[str, Any]:
+        self.logger.info(f"Running code in local Python subprocess, code length: {len(code)}, test_code length: {len(test_code)}")
+        cancellation = cancellation or RunCancellation()
+        timeout = float(os.getenv("LOCAL_PYTHON_BACKEND_TIMEOUT", "30"))
+        try:
+            with tempfile.TemporaryDirectory(prefix="test2code_", dir=self.get_workspace_root()) as temp_dir:
+                unique_filename = self.get_filename()
+
+                build_start_time = time.time()
+                with tracer.span("build", **self.get_span_attributes()):
+                    for name, content in self.get_source_files(unique_filename, code, test_code).items():
+                        with open(os.path.join(temp_dir, name), "w") as file:
+                            file.write(content)
+                results_path = os.path.join(temp_dir, "test_results.json")
+                build_time = (time.time() - build_start_time) * 1000
+
+                command = self.get_network_isolation_prefix() + self.get_resource_limit_prefix() + [
+                    sys.executable, "-m", "pytest", "-p", "no:cacheprovider",
+                ] + self.get_pytest_args(temp_dir, unique_filename, max_failures, only_tests)
+
+                run_start_time = time.time()
+                process = subprocess.Popen(
+                    command,
+                    cwd=temp_dir,
+                    env={"PATH": os.getenv("PATH", ""), "HOME": temp_dir, "PYTHONDONTWRITEBYTECODE": "1"},
+                    stdout=subprocess.PIPE if on_test_result is not None else subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    start_new_session=True,
+                )
+                timed_out = threading.Event()
+
+                def kill_session():
+                    # Kill the whole session, the tests may have started processes of their own
+                    try:
+                        os.killpg(process.pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+
+                def on_timeout():
+                    timed_out.set()
+                    kill_session()
+
+                timer = threading.Timer(timeout, on_timeout)
+                timer.start()
+                try:
+                    with tracer.span("run", **self.get_span_attributes()), cancellation.on_cancel(kill_session):
+                        if on_test_result is not None:
+                            self.stream_test_progress(iter(partial(process.stdout.read1, 65536), b""), on_test_result)
+                            process.stdout.close()
+                        process.wait()
+                finally:
+                    timer.cancel()
+                    kill_session()
+
+                cancellation.raise_if_cancelled()
+                if timed_out.is_set():
+                    self.logger.error(f"Local test run timed out after {timeout} seconds")
+                    return {"error": f"Test run timed out after {timeout} seconds"}
+                run_time = (time.time() - run_start_time) * 1000
+
+                if not os.path.exists(results_path):
+                    # pytest was killed before writing its report, e.g. by the CPU or memory limit
+                    self.logger.error(f"Local test run ended without results, exit code {process.returncode}")
+                    return {"error": f"Test run ended without results, exit code {process.returncode}"}
+
+                extract_start_time = time.time()
+                with tracer.span("parse", **self.get_span_attributes()), open(results_path) as results_file:
+                    test_results = self.parse_test_results(results_file.read())
+                extract_time = (time.time() - extract_start_time) * 1000
+
+                self.logger.info("Successfully ran code in local Python subprocess")
+                return {
+                    "test_results": test_results,
+                    "build_time": build_time,
+                    "run_time": run_time,
+                    "extract_time": extract_time,
+                    "total_time": build_time + run_time,
+                }
+        except RunCancelledError as e:
+            self.logger.info(str(e))
+            return {"error": str(e)}
+        except Exception as e:
+            self.logger.error(f"Error running code in local Python subprocess: {str(e)}")
+            return {"error": str(e)}
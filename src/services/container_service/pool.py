@@ -0,0 +1,264 @@
+# pool.py
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Tuple
+
+from docker.errors import DockerException
+
+from .image_registry import runner_images
+
+
+class PooledContainer:
+    def __init__(self, container):
+        self.container = container
+        self.uses = 0
+        self.last_used = time.time()
+
+
+class ContainerPool:
+    """
+    Keeps pre-started idle runner containers per (language, version).
+    A run checks a container out, injects its files, execs the test command inside it and
+    hands it back. Returned containers are reset with the service's reset command and put
+    back into the pool, or recycled when the reset fails, they are unhealthy or used up.
+    """
+
+    POOL_LABEL = "test2code.pool"
+
+    def __init__(self, min_size: int = 1, max_size: int = 4, idle_ttl: float = 300,
+                 max_uses: int = 20, checkout_timeout: float = 60, logger=None):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.max_uses = max_uses
+        self.checkout_timeout = checkout_timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.enabled = False
+
+        self.checkouts = 0
+        self.checkout_waits = 0
+
+        self._condition = threading.Condition()
+        self._idle: Dict[Tuple[str, str], Deque[PooledContainer]] = {}
+        self._sizes: Dict[Tuple[str, str], int] = {}
+        self._services = {}
+        self._maintenance_thread = None
+        self._stop_event = threading.Event()
+
+    def configure_from_env(self):
+        self.enabled = os.getenv("CONTAINER_POOL_ENABLED", "false").lower() == "true"
+        self.min_size = int(os.getenv("CONTAINER_POOL_MIN_SIZE", str(self.min_size)))
+        self.max_size = int(os.getenv("CONTAINER_POOL_MAX_SIZE", str(self.max_size)))
+        self.idle_ttl = float(os.getenv("CONTAINER_POOL_IDLE_TTL", str(self.idle_ttl)))
+        self.max_uses = int(os.getenv("CONTAINER_POOL_MAX_USES", str(self.max_uses)))
+        self.checkout_timeout = float(os.getenv("CONTAINER_POOL_CHECKOUT_TIMEOUT", str(self.checkout_timeout)))
+
+    @staticmethod
+    def get_key(service) -> Tuple[str, str]:
+        return service.LANGUAGE, service.version
+
+    def _start_container(self, service) -> PooledContainer:
+        image_id = runner_images.get_image(service)
+        container = service.docker_client.containers.run(
+            image=image_id,
+            command=["sleep", "infinity"],
+            working_dir=service.WORKDIR,
+            name=service.get_container_name("pool"),
+            labels={self.POOL_LABEL: "true"},
+            detach=True,
+            **service.get_container_options()
+        )
+        self.logger.info(f"Started pooled container {container.short_id} for {service.LANGUAGE} {service.version}")
+        return PooledContainer(container)
+
+    @staticmethod
+    def _is_healthy(pooled: PooledContainer) -> bool:
+        try:
+            pooled.container.reload()
+            return pooled.container.status == "running"
+        except DockerException:
+            return False
+
+    def _remove_container(self, pooled: PooledContainer):
+        try:
+            pooled.container.remove(force=True)
+        except DockerException as e:
+            self.logger.error(f"Error removing pooled container: {str(e)}")
+
+    def _discard(self, key: Tuple[str, str], pooled: PooledContainer):
+        with self._condition:
+            self._sizes[key] -= 1
+            self._condition.notify()
+        self._remove_container(pooled)
+
+    def _acquire(self, service) -> PooledContainer:
+        key = self.get_key(service)
+        deadline = time.time() + self.checkout_timeout
+        with self._condition:
+            self._services.setdefault(key, service)
+            idle = self._idle.setdefault(key, deque())
+            self._sizes.setdefault(key, 0)
+            self.checkouts += 1
+            if not idle and self._sizes[key] >= self.max_size:
+                self.checkout_waits += 1
+            while not idle and self._sizes[key] >= self.max_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError(f"No pooled container for {key[0]} {key[1]} available")
+                self._condition.wait(remaining)
+            if idle:
+                pooled = idle.pop()
+            else:
+                pooled = None
+                self._sizes[key] += 1
+
+        if pooled is not None:
+            if self._is_healthy(pooled):
+                return pooled
+            self.logger.info(f"Recycling unhealthy pooled container {pooled.container.short_id}")
+            self._discard(key, pooled)
+            return self._acquire(service)
+
+        try:
+            return self._start_container(service)
+        except Exception:
+            with self._condition:
+                self._sizes[key] -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, service, pooled: PooledContainer, healthy: bool):
+        key = self.get_key(service)
+        pooled.uses += 1
+        pooled.last_used = time.time()
+
+        if healthy and pooled.uses < self.max_uses:
+            try:
+                exit_code, _ = pooled.container.exec_run(service.get_reset_command())
+                healthy = exit_code == 0
+            except DockerException:
+                healthy = False
+        else:
+            healthy = False
+
+        if not healthy:
+            self._discard(key, pooled)
+            return
+
+        with self._condition:
+            self._idle.setdefault(key, deque()).append(pooled)
+            self._condition.notify()
+
+    @contextmanager
+    def checkout(self, service):
+        """
+        Check out a started runner container for the given service
+        :param service: The container service that runs the code
+        :return: Context manager yielding the docker container
+        """
+        pooled = self._acquire(service)
+        healthy = True
+        try:
+            yield pooled.container
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            self._release(service, pooled, healthy)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Utilization of the pool per runtime
+        """
+        with self._condition:
+            runtimes = {}
+            for (language, version), size in self._sizes.items():
+                in_use = size - len(self._idle.get((language, version), ()))
+                runtimes[f"{language}:{version}"] = {
+                    "size": size,
+                    "idle": size - in_use,
+                    "in_use": in_use,
+                    "utilization": in_use / self.max_size if self.max_size else 0,
+                }
+            return {
+                "enabled": self.enabled,
+                "max_size": self.max_size,
+                "checkouts": self.checkouts,
+                "checkout_waits": self.checkout_waits,
+                "runtimes": runtimes,
+            }
+
+    def maintain(self):
+        """
+        Recycle unhealthy idle containers, remove idle containers past their TTL (keeping
+        min_size) and top up every known runtime to min_size started containers
+        """
+        now = time.time()
+        for key in list(self._services):
+            with self._condition:
+                candidates = list(self._idle.setdefault(key, deque()))
+            for pooled in candidates:
+                if self._is_healthy(pooled):
+                    continue
+                with self._condition:
+                    if pooled not in self._idle[key]:
+                        continue
+                    self._idle[key].remove(pooled)
+                self.logger.info(f"Recycling unhealthy pooled container {pooled.container.short_id}")
+                self._discard(key, pooled)
+
+            expired = []
+            with self._condition:
+                idle = self._idle[key]
+                while idle and self._sizes[key] > self.min_size and now - idle[0].last_used > self.idle_ttl:
+                    expired.append(idle.popleft())
+                    self._sizes[key] -= 1
+                missing = max(0, self.min_size - self._sizes[key])
+                self._sizes[key] += missing
+            for pooled in expired:
+                self._remove_container(pooled)
+
+            for _ in range(missing):
+                try:
+                    pooled = self._start_container(self._services[key])
+                except Exception as e:
+                    self.logger.error(f"Error starting pooled container for {key[0]} {key[1]}: {str(e)}")
+                    with self._condition:
+                        self._sizes[key] -= 1
+                    continue
+                with self._condition:
+                    self._idle[key].append(pooled)
+                    self._condition.notify()
+
+    def _maintenance_loop(self, interval: float):
+        while not self._stop_event.wait(interval):
+            try:
+                self.maintain()
+            except Exception as e:
+                self.logger.error(f"Error maintaining container pool: {str(e)}")
+
+    def start(self, interval: float = 10):
+        if not self.enabled or self._maintenance_thread is not None:
+            return
+        self._stop_event.clear()
+        self._maintenance_thread = threading.Thread(target=self._maintenance_loop, args=(interval,), daemon=True)
+        self._maintenance_thread.start()
+
+    def shutdown(self):
+        self._stop_event.set()
+        self._maintenance_thread = None
+        with self._condition:
+            idle = [pooled for containers in self._idle.values() for pooled in containers]
+            for key, containers in self._idle.items():
+                self._sizes[key] -= len(containers)
+                containers.clear()
+        for pooled in idle:
+            self._remove_container(pooled)
+
+
+container_pool = ContainerPool()
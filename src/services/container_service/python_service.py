@@ -2,16 +2,21 @@
 
 import re
 import ast
-from typing import Dict, Any, Tuple
+import builtins
+from typing import Dict, Any, List, Optional, Tuple
 from .base import ContainerService
+from .cancellation import RunCancellation
 
 import logging
 
 class PythonContainerService(ContainerService):
+    LANGUAGE = "python"
+    # pytest -v reports every finished test as "<nodeid> <OUTCOME> [ nn%]"
+    PROGRESS_LINE_PATTERN = re.compile(r'^(\S+::\S+)\s+(PASSED|FAILED|ERROR|SKIPPED|XFAIL|XPASS)\b')
     SUPPORTED_VERSIONS = ["3.6", "3.7", "3.8", "3.9", "3.10", "3.11"]
 
-    def __init__(self, version: str = "3.11", logger=None):
-        super().__init__(version, logger)
+    def __init__(self, version: str = "3.11", logger=None, docker_client=None):
+        super().__init__(version, logger, docker_client)
         if not self.version:
             self.version = "3.11"
 
@@ -27,10 +32,10 @@ class PythonContainerService(ContainerService):
     def get_supported_versions(cls):
         return cls.SUPPORTED_VERSIONS
 
-    def get_dockerfile_content(self, filename: str) -> str:
+    def get_runner_dockerfile_content(self) -> str:
         """
-        Get the content of the Dockerfile for Python code
-        :param filename: Filename of the Python file
+        Get the content of the Dockerfile for the Python runner image.
+        The image only contains the interpreter and the test dependencies, the code is injected at run time.
         :return: Content of the Dockerfile
         """
         python_version = self.version
@@ -38,17 +43,122 @@ class PythonContainerService(ContainerService):
         return f"""
         FROM python:{python_version}
         WORKDIR /app
-        COPY {filename}.py /app/{filename}.py
-        RUN pip install pytest pytest-json-report
+        RUN pip install --no-cache-dir pytest pytest-json-report
         """
 
-    def get_run_command(self, filename: str) -> str:
+    @staticmethod
+    def get_pytest_args(directory: str, filename: str, max_failures: int = None,
+                        only_tests: List[str] = None) -> List[str]:
+        """
+        Get the pytest arguments for a test run
+        :param directory: Directory containing the Python file, the report is written there as well
+        :param filename: Filename of the Python code
+        :param max_failures: Stop after this many failing tests
+        :param only_tests: Test ids to run instead of the whole file
+        :return: The arguments
+        """
+        if only_tests:
+            targets = [f"{directory}/{filename}.py::{test_id}" for test_id in only_tests]
+        else:
+            targets = [f"{directory}/{filename}.py"]
+        args = targets + ["-v", "-k", "test_", "--json-report", f"--json-report-file={directory}/test_results.json"]
+        if max_failures:
+            args.append(f"--maxfail={max_failures}")
+        return args
+
+    def get_run_command(self, filename: str, max_failures: int = None, only_tests: List[str] = None):
         """
         Get the command to run the Python code in a Docker container
         :param filename: Filename of the Python code
+        :param max_failures: Stop after this many failing tests
+        :param only_tests: Test ids to run instead of the whole file
         :return: Command to run the Python code
         """
-        return f"pytest /app/{filename}.py -v -k test_ --json-report --json-report-file=/app/test_results.json"
+        return ["pytest"] + self.get_pytest_args(self.WORKDIR, filename, max_failures, only_tests)
+
+    def get_test_id(self, test_name: str) -> str:
+        # Node ids start with the per-run filename, the part after it identifies the test in every run
+        return test_name.split("::", 1)[-1]
+
+    def parse_progress_line(self, line: str) -> Optional[Tuple[str, str]]:
+        match = self.PROGRESS_LINE_PATTERN.match(line)
+        if match is None:
+            return None
+        return match.group(1), match.group(2).lower()
+
+    @staticmethod
+    def is_test_node(node: ast.AST) -> bool:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            return node.name.startswith("test_")
+        return isinstance(node, ast.ClassDef) and node.name.startswith("Test")
+
+    @staticmethod
+    def get_free_names(node: ast.AST) -> set:
+        """
+        Get the names a test reads but does not assign, i.e. the functions, classes and modules it uses
+        """
+        loaded, bound = set(), set()
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name):
+                (loaded if isinstance(child.ctx, ast.Load) else bound).add(child.id)
+            elif isinstance(child, ast.arg):
+                bound.add(child.arg)
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                bound.add(child.name)
+        return loaded - bound
+
+    def split_testcases(self, testcases: str) -> List[str]:
+        """
+        Split testcases into groups of tests that use disjoint functions and classes. Tests using the same
+        name share an implementation and stay in one group. Statements that are no tests (imports, fixtures,
+        helpers) are repeated in every group.
+        :param testcases: The testcases of a request
+        :return: The groups, a single group if the testcases cannot be split
+        """
+        try:
+            tree = ast.parse(testcases)
+        except SyntaxError:
+            return [testcases]
+
+        lines = testcases.splitlines()
+        # Names defined or imported by the testcases themselves are no implementation
+        defined = set()
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                defined.add(node.name)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                defined.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+            else:
+                defined.update(child.id for child in ast.walk(node)
+                               if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store))
+        shared, tests = [], []
+        for node in tree.body:
+            start = min([node.lineno] + [decorator.lineno for decorator in getattr(node, "decorator_list", [])])
+            source = "\n".join(lines[start - 1:node.end_lineno])
+            if not self.is_test_node(node):
+                shared.append(source)
+                continue
+            tests.append((source, self.get_free_names(node) - defined - set(dir(builtins))))
+
+        # Tests that use a common name end up in the group of the first of them, tests without
+        # free names are kept together
+        groups = []
+        for source, called in tests:
+            matching = [group for group in groups if group["called"] & called or not (group["called"] or called)]
+            if not matching:
+                groups.append({"sources": [source], "called": set(called)})
+                continue
+            target = matching[0]
+            for group in matching[1:]:
+                target["sources"].extend(group["sources"])
+                target["called"] |= group["called"]
+                groups.remove(group)
+            target["sources"].append(source)
+            target["called"] |= called
+
+        if len(groups) < 2:
+            return [testcases]
+        return ["\n\n".join(shared + group["sources"]) for group in groups]
 
     def get_file_extension(self) -> str:
         """
@@ -88,7 +198,9 @@ class PythonContainerService(ContainerService):
 
         return True, ""
 
-    def run_code_in_container(self, code: str, test_code: str) -> Dict[str, Any]:
+    def run_code_in_container(self, code: str, test_code: str, use_cache: bool = True, max_failures: int = None,
+                              only_tests: List[str] = None, on_test_result=None,
+                              cancellation: RunCancellation = None) -> Dict[str, Any]:
         self.logger.info("Running code in Python container")
         # Validate main code
         is_valid, error_msg = self.validate_code(code)
@@ -103,4 +215,6 @@ class PythonContainerService(ContainerService):
                 self.logger.error(f"Invalid test code. {error_msg}")
                 return {"error": f"Invalid test code. {error_msg}"}
 
-        return super().run_code_in_container(code, test_code)
+        return super().run_code_in_container(
+            code, test_code, use_cache, max_failures, only_tests, on_test_result, cancellation
+        )
@@ -0,0 +1,214 @@
+# sandbox.py
+
+import os
+import shlex
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+from services.metrics_service import observe_sandbox_kill
+
+
+class SandboxTimeoutError(TimeoutError):
+    """
+    A test run exceeded its wall-clock timeout and was killed
+    """
+
+
+class SandboxCapacityError(RuntimeError):
+    """
+    A test run could not be admitted because the host capacity stayed exhausted
+    """
+
+
+class SandboxScheduler:
+    """
+    Applies the cgroup limits to the runner containers and admits test runs against the capacity of the host.
+    Every run reserves the CPUs and the memory of its container limits, a run only starts when its
+    reservation fits into the capacity. A run that alone exceeds the capacity is admitted once no other
+    run is executing, so it cannot wait forever.
+    """
+
+    # Exit code of a process killed with SIGKILL, by the timeout or by the out-of-memory killer
+    KILLED_EXIT_CODE = 137
+
+    def __init__(self, cpus: float = 1.0, memory_mb: int = 512, pids_limit: int = 256,
+                 network_disabled: bool = True, run_timeout: float = 60, admission_timeout: float = 60,
+                 tmpfs_mb: int = 0):
+        self.cpus = cpus
+        self.memory_mb = memory_mb
+        self.pids_limit = pids_limit
+        self.network_disabled = network_disabled
+        self.run_timeout = run_timeout
+        self.admission_timeout = admission_timeout
+        # Size of the in-memory workspaces of the runs, 0 keeps the workspaces in the container file system
+        self.tmpfs_mb = tmpfs_mb
+        self.language_limits: Dict[str, Dict[str, float]] = {}
+        self.capacity_cpus = float(os.cpu_count() or 1)
+        self.capacity_memory_mb = self.get_host_memory_mb()
+
+        self.reserved_cpus = 0.0
+        self.reserved_memory_mb = 0
+        self.admitted_runs = 0
+        self.rejected_runs = 0
+        self.admission_waits = 0
+        self.timed_out_runs = 0
+        self.out_of_memory_runs = 0
+        self._running = 0
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def get_host_memory_mb() -> int:
+        try:
+            return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / (1024 * 1024))
+        except (ValueError, OSError, AttributeError):
+            return 4096
+
+    def configure_from_env(self, languages):
+        """
+        Read SANDBOX_CPUS, SANDBOX_MEMORY_MB, SANDBOX_PIDS_LIMIT, SANDBOX_NETWORK_DISABLED, SANDBOX_RUN_TIMEOUT,
+        SANDBOX_ADMISSION_TIMEOUT, SANDBOX_CAPACITY_CPUS, SANDBOX_CAPACITY_MEMORY_MB and SANDBOX_TMPFS_MB.
+        SANDBOX_CPUS_<LANGUAGE>, SANDBOX_MEMORY_MB_<LANGUAGE> and SANDBOX_RUN_TIMEOUT_<LANGUAGE> (e.g.
+        SANDBOX_MEMORY_MB_JAVA) override the limits of a language.
+        """
+        self.cpus = float(os.getenv("SANDBOX_CPUS", str(self.cpus)))
+        self.memory_mb = int(os.getenv("SANDBOX_MEMORY_MB", str(self.memory_mb)))
+        self.pids_limit = int(os.getenv("SANDBOX_PIDS_LIMIT", str(self.pids_limit)))
+        self.network_disabled = os.getenv("SANDBOX_NETWORK_DISABLED", str(self.network_disabled)).lower() == "true"
+        self.run_timeout = float(os.getenv("SANDBOX_RUN_TIMEOUT", str(self.run_timeout)))
+        self.admission_timeout = float(os.getenv("SANDBOX_ADMISSION_TIMEOUT", str(self.admission_timeout)))
+        self.capacity_cpus = float(os.getenv("SANDBOX_CAPACITY_CPUS", str(self.capacity_cpus)))
+        self.capacity_memory_mb = int(os.getenv("SANDBOX_CAPACITY_MEMORY_MB", str(self.capacity_memory_mb)))
+        self.tmpfs_mb = int(os.getenv("SANDBOX_TMPFS_MB", str(self.tmpfs_mb)))
+        self.language_limits = {}
+        for language in languages:
+            limits = {}
+            for key, env_name, cast in (("cpus", "SANDBOX_CPUS", float), ("memory_mb", "SANDBOX_MEMORY_MB", int),
+                                        ("run_timeout", "SANDBOX_RUN_TIMEOUT", float)):
+                value = os.getenv(f"{env_name}_{language.upper()}")
+                if value:
+                    limits[key] = cast(value)
+            if limits:
+                self.language_limits[language] = limits
+        # timeout treats 0 as no limit at all
+        for language in [None] + list(languages):
+            run_timeout = self.get_run_timeout(language)
+            if run_timeout <= 0:
+                raise ValueError(f"The run timeout must be positive, got {run_timeout} seconds")
+
+    def get_limit(self, language: str, key: str):
+        return self.language_limits.get(language, {}).get(key, getattr(self, key))
+
+    def get_run_timeout(self, language: str) -> float:
+        return self.get_limit(language, "run_timeout")
+
+    @property
+    def tmpfs_enabled(self) -> bool:
+        return self.tmpfs_mb > 0
+
+    def get_container_options(self, language: str, workspace_paths: List[str] = ()) -> Dict[str, Any]:
+        """
+        Get the arguments of containers.create / containers.run that limit a runner container
+        :param language: Language of the runner, selects its limits
+        :param workspace_paths: Directories of the runs, mounted as tmpfs when SANDBOX_TMPFS_MB is set
+        """
+        memory = f"{self.get_limit(language, 'memory_mb')}m"
+        options = {
+            "nano_cpus": int(self.get_limit(language, "cpus") * 1e9),
+            "mem_limit": memory,
+            # Same as the memory limit: the container gets no swap
+            "memswap_limit": memory,
+            "pids_limit": self.pids_limit,
+            "network_disabled": self.network_disabled,
+        }
+        if self.tmpfs_enabled and workspace_paths:
+            # The pages of a tmpfs count towards the memory limit of the container
+            options["tmpfs"] = {path: f"rw,size={self.tmpfs_mb}m,mode=1777" for path in workspace_paths}
+        return options
+
+    def get_timeout_command(self, language: str, command) -> list:
+        """
+        Wrap a command run with exec in a started container, exec has no timeout of its own.
+        The command is killed after the run timeout and exits with KILLED_EXIT_CODE.
+        :param command: Command as list of arguments or as shell-like string, e.g. the Maven command of Java
+        """
+        if isinstance(command, str):
+            command = shlex.split(command)
+        # Fractions of a second are kept, timeout would read a truncated 0 as no limit
+        return ["timeout", "-s", "KILL", f"{self.get_run_timeout(language):g}"] + list(command)
+
+    def _fits(self, cpus: float, memory_mb: int) -> bool:
+        if self._running == 0:
+            return True
+        return (self.reserved_cpus + cpus <= self.capacity_cpus
+                and self.reserved_memory_mb + memory_mb <= self.capacity_memory_mb)
+
+    @contextmanager
+    def admit(self, language: str):
+        """
+        Reserve the capacity of a run while it executes
+        :param language: Language of the run, selects its limits
+        :raises SandboxCapacityError: If the capacity stays exhausted for the admission timeout
+        """
+        cpus = self.get_limit(language, "cpus")
+        memory_mb = self.get_limit(language, "memory_mb")
+        deadline = time.time() + self.admission_timeout
+        with self._condition:
+            if not self._fits(cpus, memory_mb):
+                self.admission_waits += 1
+            while not self._fits(cpus, memory_mb):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.rejected_runs += 1
+                    raise SandboxCapacityError(
+                        f"Host capacity exhausted, no run slot for {language} within {self.admission_timeout} seconds"
+                    )
+                self._condition.wait(remaining)
+            self.reserved_cpus += cpus
+            self.reserved_memory_mb += memory_mb
+            self.admitted_runs += 1
+            self._running += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.reserved_cpus -= cpus
+                self.reserved_memory_mb -= memory_mb
+                self._running -= 1
+                self._condition.notify_all()
+
+    def record_timeout(self, language: str):
+        with self._condition:
+            self.timed_out_runs += 1
+        observe_sandbox_kill("timeout", language)
+
+    def record_out_of_memory(self, language: str):
+        with self._condition:
+            self.out_of_memory_runs += 1
+        observe_sandbox_kill("out_of_memory", language)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "limits": {
+                    "cpus": self.cpus,
+                    "memory_mb": self.memory_mb,
+                    "pids_limit": self.pids_limit,
+                    "network_disabled": self.network_disabled,
+                    "run_timeout": self.run_timeout,
+                    "tmpfs_mb": self.tmpfs_mb,
+                    "languages": self.language_limits,
+                },
+                "capacity": {"cpus": self.capacity_cpus, "memory_mb": self.capacity_memory_mb},
+                "reserved": {"cpus": self.reserved_cpus, "memory_mb": self.reserved_memory_mb},
+                "running": self._running,
+                "admitted_runs": self.admitted_runs,
+                "admission_waits": self.admission_waits,
+                "rejected_runs": self.rejected_runs,
+                "timed_out_runs": self.timed_out_runs,
+                "out_of_memory_runs": self.out_of_memory_runs,
+            }
+
+
+sandbox_scheduler = SandboxScheduler()
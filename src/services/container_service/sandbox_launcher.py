@@ -0,0 +1,24 @@
+# sandbox_launcher.py
+#
+# Applies resource limits to itself and replaces itself with the given command.
+# Used instead of a preexec_fn, which is not safe to use from the threads of the container executor.
+#
+# Usage: python sandbox_launcher.py <cpu seconds> <memory bytes> <file size bytes> <command...>
+
+import os
+import resource
+import sys
+
+
+def main():
+    cpu_seconds, memory_bytes, file_size_bytes = (int(value) for value in sys.argv[1:4])
+    command = sys.argv[4:]
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (file_size_bytes, file_size_bytes))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    os.execv(command[0], command)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# __init__.py
+
+from .event_stream import EventStream, format_sse
+
+__all__ = ['EventStream',
+           'format_sse']
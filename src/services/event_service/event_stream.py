@@ -0,0 +1,58 @@
+# event_stream.py
+
+import asyncio
+import json
+from typing import AsyncIterator, Dict, List, Set
+
+# Token events are only delivered live, replaying them to late subscribers would cost too much memory
+TRANSIENT_EVENTS = {"llm_token"}
+
+
+def format_sse(event: Dict) -> str:
+    """
+    Format an event as a server-sent event message
+    :param event: Event with "event" and "data" keys
+    :return: The SSE message
+    """
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+class EventStream:
+    """
+    Fan-out of progress events to any number of subscribers.
+    Subscribers that join late get the non-transient events emitted so far replayed first.
+    """
+
+    def __init__(self):
+        self.closed = False
+        self._history: List[Dict] = []
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    async def emit(self, event: str, data: Dict):
+        message = {"event": event, "data": data}
+        if event not in TRANSIENT_EVENTS:
+            self._history.append(message)
+        for queue in self._subscribers:
+            queue.put_nowait(message)
+
+    def close(self):
+        self.closed = True
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+
+    async def subscribe(self) -> AsyncIterator[Dict]:
+        queue = asyncio.Queue()
+        history = list(self._history)
+        self._subscribers.add(queue)
+        try:
+            for message in history:
+                yield message
+            if self.closed:
+                return
+            while True:
+                message = await queue.get()
+                if message is None:
+                    return
+                yield message
+        finally:
+            self._subscribers.discard(queue)
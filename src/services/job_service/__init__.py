@@ -0,0 +1,10 @@
+# __init__.py
+
+from .job_queue import Job, JobQueue, JobQueueFullError, job_queue
+from .job_store import JobStore
+
+__all__ = ['Job',
+           'JobQueue',
+           'JobQueueFullError',
+           'JobStore',
+           'job_queue']
@@ -0,0 +1,210 @@
+# job_queue.py
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+from services.event_service import EventStream
+from services.logging_service import tracer
+
+from .job_store import JobStore
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, request: dict, logger, job_id: str = None):
+        self.job_id = job_id or str(uuid.uuid4())
+        self.status = "queued"
+        self.request = request
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.logger = logger
+        self.done = asyncio.Event()
+        self.events = EventStream()
+
+    @classmethod
+    def from_dict(cls, data: dict, logger):
+        job = cls(data["request"], logger, job_id=data["job_id"])
+        job.status = data["status"]
+        job.result = data["result"]
+        job.error = data["error"]
+        job.created_at = data["created_at"]
+        job.started_at = data["started_at"]
+        job.finished_at = data["finished_at"]
+        if job.finished_at is not None:
+            job.done.set()
+            job.events.close()
+        return job
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "request": self.request,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    In-process job queue with a bounded number of workers.
+    Submissions are rejected with JobQueueFullError once max_queue_size jobs are waiting.
+    Finished jobs are kept for result_ttl seconds, optionally persisted in SQLite.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue_size: int = 100, result_ttl: float = 3600,
+                 store_path: str = None, logger=None):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.result_ttl = result_ttl
+        self.store_path = store_path
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.store: Optional[JobStore] = None
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._handler = None
+
+    def configure_from_env(self):
+        self.max_workers = int(os.getenv("JOB_WORKERS", str(self.max_workers)))
+        self.max_queue_size = int(os.getenv("JOB_QUEUE_SIZE", str(self.max_queue_size)))
+        self.result_ttl = float(os.getenv("JOB_RESULT_TTL", str(self.result_ttl)))
+        self.store_path = os.getenv("JOB_STORE_PATH", self.store_path or "") or None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def start(self, handler: Callable[..., Awaitable[dict]]):
+        """
+        Start the workers
+        :param handler: Coroutine function called with the job request fields, the job logger and an on_event callback
+        """
+        self._handler = handler
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        if self.store_path:
+            self.store = JobStore(self.store_path)
+            # Resume the jobs a previous process did not finish
+            for data in await asyncio.to_thread(self.store.load_unfinished):
+                job = Job.from_dict(data, self.logger)
+                job.status = "queued"
+                self._jobs[job.job_id] = job
+                try:
+                    self._queue.put_nowait(job)
+                except asyncio.QueueFull:
+                    await self._finish(job, "failed", error="Job could not be resumed, queue is full")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_workers)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self.store:
+            self.store.close()
+            self.store = None
+
+    async def _persist(self, job: Job):
+        if self.store:
+            await asyncio.to_thread(self.store.save, job.to_dict())
+
+    async def _evict_finished(self):
+        threshold = time.time() - self.result_ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < threshold]:
+            del self._jobs[job_id]
+        if self.store:
+            await asyncio.to_thread(self.store.delete_finished_before, threshold)
+
+    async def submit(self, request: dict, logger) -> Job:
+        """
+        Queue a job
+        :param request: The fields passed to the handler
+        :param logger: Logger of the submitting request
+        :return: The queued job
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue is not started")
+        await self._evict_finished()
+
+        job = Job(request, logger)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            logger.error(f"Job queue is full ({self.max_queue_size} jobs waiting)")
+            raise JobQueueFullError(f"Job queue is full ({self.max_queue_size} jobs waiting)")
+
+        self._jobs[job.job_id] = job
+        logger.info(f"Queued job {job.job_id}, queue depth {self.depth}")
+        await self._persist(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None and self.store:
+            data = await asyncio.to_thread(self.store.load, job_id)
+            if data:
+                job = Job.from_dict(data, self.logger)
+        return job
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Job]:
+        """
+        Get a job, waiting up to timeout seconds for it to finish (long polling)
+        """
+        job = await self.get(job_id)
+        if job is not None and timeout > 0:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def _finish(self, job: Job, status: str, result: dict = None, error: str = None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        job.done.set()
+        await job.events.emit(status, {"job_id": job.job_id, "result": result, "error": error})
+        job.events.close()
+        await self._persist(job)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                job.status = "running"
+                job.started_at = time.time()
+                await self._persist(job)
+                job.logger.info(f"Running job {job.job_id}")
+                await job.events.emit("running", {"job_id": job.job_id})
+                # The job continues the trace of the request that submitted it
+                tracer.start_trace(getattr(job.logger, "extra", {}).get("request_id"))
+                with tracer.span("job", job_id=job.job_id):
+                    result = await self._handler(**job.request, logger=job.logger, on_event=job.events.emit)
+                await self._finish(job, "completed", result=result)
+                job.logger.info(f"Finished job {job.job_id}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.logger.error(f"Job {job.job_id} failed: {str(e)}")
+                await self._finish(job, "failed", error=str(e))
+            finally:
+                self._queue.task_done()
+
+
+job_queue = JobQueue()
@@ -0,0 +1,83 @@
+# job_store.py
+
+import json
+import sqlite3
+import threading
+from typing import List, Optional
+
+
+class JobStore:
+    """
+    SQLite persistence for jobs, so results survive a restart and unfinished jobs can be resumed
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    request TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+                """
+            )
+
+    def save(self, job: dict):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job["job_id"],
+                    job["status"],
+                    json.dumps(job["request"]),
+                    json.dumps(job["result"]) if job["result"] is not None else None,
+                    job["error"],
+                    job["created_at"],
+                    job["started_at"],
+                    job["finished_at"],
+                ),
+            )
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        return {
+            "job_id": row[0],
+            "status": row[1],
+            "request": json.loads(row[2]),
+            "result": json.loads(row[3]) if row[3] is not None else None,
+            "error": row[4],
+            "created_at": row[5],
+            "started_at": row[6],
+            "finished_at": row[7],
+        }
+
+    def load(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def load_unfinished(self) -> List[dict]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def delete_finished_before(self, timestamp: float):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (timestamp,)
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
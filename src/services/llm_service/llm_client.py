@@ -0,0 +1,105 @@
+# llm_client.py
+
+import logging
+import os
+from contextlib import contextmanager
+from typing import Any, Dict
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+
+class LLMClientProvider:
+    """
+    Application-lifetime OpenAI client shared by all requests, so completions reuse the
+    kept-alive connections of one tuned HTTP connection pool.
+    The settings are read from the environment variables starting with env_prefix, e.g. OPENAI_MAX_CONNECTIONS,
+    so the same provider serves OpenAI and OpenAI-compatible servers.
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 60, timeout: float = 120, max_retries: int = 2, logger=None,
+                 env_prefix: str = "OPENAI", default_api_key: str = None):
+        self.env_prefix = env_prefix
+        # Local servers usually accept any key, the client needs one nevertheless
+        self.default_api_key = default_api_key
+        self.base_url = None
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+        self._client = None
+
+    def configure_from_env(self):
+        prefix = self.env_prefix
+        # Without a base URL the client talks to the OpenAI API
+        self.base_url = os.getenv(f"{prefix}_BASE_URL") or None
+        self.max_connections = int(os.getenv(f"{prefix}_MAX_CONNECTIONS", str(self.max_connections)))
+        self.max_keepalive_connections = int(
+            os.getenv(f"{prefix}_MAX_KEEPALIVE_CONNECTIONS", str(self.max_keepalive_connections))
+        )
+        self.keepalive_expiry = float(os.getenv(f"{prefix}_KEEPALIVE_EXPIRY", str(self.keepalive_expiry)))
+        self.timeout = float(os.getenv(f"{prefix}_TIMEOUT", str(self.timeout)))
+        self.max_retries = int(os.getenv(f"{prefix}_MAX_RETRIES", str(self.max_retries)))
+
+    def create_client(self) -> AsyncOpenAI:
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            timeout=self.timeout,
+        )
+        return AsyncOpenAI(
+            api_key=os.getenv(f"{self.env_prefix}_API_KEY", self.default_api_key), base_url=self.base_url,
+            http_client=http_client, max_retries=self.max_retries
+        )
+
+    def get(self) -> AsyncOpenAI:
+        """
+        Get the shared client, it is created on first use
+        """
+        if self._client is None:
+            self._client = self.create_client()
+        return self._client
+
+    @contextmanager
+    def track(self):
+        """
+        Count a request against the pool utilization while it is in flight
+        """
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self._client is not None,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_connections": self.max_connections,
+            "utilization": self.in_flight / self.max_connections if self.max_connections else 0,
+        }
+
+
+llm_clients = LLMClientProvider()
+# Client of an OpenAI-compatible server, e.g. a llama.cpp or vLLM server running a local model
+local_llm_clients = LLMClientProvider(env_prefix="LOCAL_LLM", default_api_key="local")
@@ -93,4 +93,11 @@ Error Handling:
     - errortype: Must be one of: ""(empty String),logicError, syntaxError, dependencyError, noValidCode, unknownError.
     - source: Must be one of: ""(empty String),testcases, implementation.
     - Append test cases sharing the same implementation to a single "test2code" object.
-"""
\ No newline at end of file
+"""
+
+# Follow-up turn of a conversation that started with SYSTEM_PROMPT_GENERATION
+REVISE_TURN_PROMPT = """The implementation failed. Modify the implementation of the testcases below to fix the error so that the unit tests pass.
+- You can only modify the implementation; the test case CANNOT, under no circumstances, be changed but only the formattation.
+- Answer with the same JSON structure as before, containing only the test2code objects of the testcases below.
+
+"""
@@ -1,41 +1,209 @@
-from openai import OpenAI
-from .llm_prompt import SYSTEM_PROMPT_GENERATION, SYSTEM_PROMPT_REVISE
+from openai import AsyncOpenAI
+from .llm_prompt import SYSTEM_PROMPT_GENERATION, SYSTEM_PROMPT_REVISE, REVISE_TURN_PROMPT
+from .providers import llm_router
+from .response_schema import parse_response
 import json
+import os
 
 class CodeGenerator:
-    def __init__(self, api_key: str, logger):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, logger, client: AsyncOpenAI = None, model: str = None):
+        """
+        :param client: Client used for every call instead of the clients of the providers
+        :param model: Model of every call as <provider>:<model>, without it the job starts on the small model
+                      of the router and escalates to the default model
+        :raises ValueError: If the model or its provider is not available
+        """
         self.logger = logger
+        self._client = client
+        self.models = llm_router.get_models(model)
+        self.model_index = -1
+        # Calls made with the current model, the small model is escalated once they reach its attempts
+        self.model_calls = 0
+        self._select_model(0)
+        # Token usage of the last call, None when the API did not report it
+        self.last_usage = None
+        # Messages of the job so far, revisions continue the conversation instead of starting a new chat.
+        # The system prompt and the testcases stay the first messages, so every revision request starts with
+        # the prefix of the previous one and hits the provider's prompt cache.
+        self.conversation_enabled = os.getenv("LLM_CONVERSATION_ENABLED", "true").lower() == "true"
+        self.conversation = None
+
+    def _select_model(self, index: int):
+        self.provider, self.model_name = llm_router.resolve(self.models[index])
+        self.model_index = index
+        self.model_calls = 0
+        # The application-wide clients keep their connections alive across requests
+        self.client = self._client or self.provider.get_client()
+        # Constrains the answers to the test2code structure, see LLM_RESPONSE_FORMAT
+        self.response_format = self.provider.response_format
+
+    @property
+    def model(self) -> str:
+        return self.models[self.model_index]
+
+    @property
+    def model_spec(self) -> str:
+        """
+        The models of the job as <provider>:<model> in the order they are used, e.g. gpt-4o and openai:gpt-4o give
+        the same spec
+        """
+        resolved = (llm_router.resolve(model) for model in self.models)
+        return ",".join(f"{provider.name}:{model_name}" for provider, model_name in resolved)
+
+    def escalate(self):
+        """
+        Switch to the next model of the job once the current model used up its attempts. The conversation
+        is kept, the next model continues from the answers of the previous one.
+        """
+        if self.model_index + 1 < len(self.models) and self.model_calls >= llm_router.small_model_attempts:
+            previous_model = self.model
+            self._select_model(self.model_index + 1)
+            self.logger.info(f"Escalating from model {previous_model} to {self.model}")
+
+    @staticmethod
+    def _usage(usage) -> dict:
+        if usage is None:
+            return None
+        details = getattr(usage, "prompt_tokens_details", None)
+        return {
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+        }
+
+    def _request_options(self) -> dict:
+        return {"response_format": self.response_format} if self.response_format else {}
+
+    async def _complete(self, messages: list, on_token=None) -> str:
+        """
+        Run a chat completion and return the content of the answer
+        :param messages: the chat messages
+        :param on_token: optional coroutine function called with every content delta, enables streaming
+        :return: the content of the answer
+        """
+        self.model_calls += 1
+        with self.provider.track():
+            if on_token is None:
+                completion = await self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=messages,
+                    **self._request_options()
+                )
+                self.last_usage = self._usage(completion.usage)
+                return completion.choices[0].message.content
+
+            stream = await self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **self._request_options()
+            )
+            content = ""
+            self.last_usage = None
+            async for chunk in stream:
+                # The usage arrives in a last chunk without choices
+                if getattr(chunk, "usage", None) is not None:
+                    self.last_usage = self._usage(chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    content += delta
+                    await on_token(delta)
+            return content
 
-    def generate_implementation(self, testcases: str):
+    @staticmethod
+    def _generation_messages(testcases: str) -> list:
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT_GENERATION},
+            {"role": "user", "content": "Input: " + testcases}
+        ]
+
+    async def generate_implementation(self, testcases: str, on_token=None):
         """
         Generate implementation code based on the given testcases
         :param testcases: the testcases that the implementation should pass
+        :param on_token: optional coroutine function called with every generated token
         :return: the generated implementation code
         """
-        self.logger.info(f"Generating implementation using OpenAI API. Testcases length: {len(testcases)}")
-        completion = self.client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT_GENERATION},
-                {"role": "user", "content": "Input: " + testcases}
-            ]
-        )
-        self.logger.info("Received response from OpenAI")
-        parsed_result = json.loads(completion.choices[0].message.content)
+        self.logger.info(f"Generating implementation using {self.model}. Testcases length: {len(testcases)}")
+        messages = self._generation_messages(testcases)
+        content = await self._complete(messages, on_token)
+        self.logger.info(f"Received response from {self.model}")
+        parsed_result = parse_response(content, self.logger)
+        if self.conversation_enabled:
+            # The validated answer, a repaired answer must not be repeated to the model in its broken form
+            self.conversation = messages + [{"role": "assistant", "content": json.dumps(parsed_result)}]
         return parsed_result
 
-    def revise_implementation(self, testcases: str, generated_methods: str, error_message: str):
-        self.logger.info("Revising implementation using OpenAI API")
-        completion = self.client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
+    def continue_conversation(self, testcases: str, implementation_obj: dict):
+        """
+        Continue the conversation from an implementation that was not generated by generate_implementation,
+        e.g. the chosen candidate of generate_implementations
+        """
+        if self.conversation_enabled:
+            self.conversation = self._generation_messages(testcases) + [
+                {"role": "assistant", "content": json.dumps(implementation_obj)}
+            ]
+
+    async def generate_implementations(self, testcases: str, candidates: int):
+        """
+        Generate several candidate implementations for the given testcases in one request
+        :param testcases: the testcases that the implementations should pass
+        :param candidates: the number of candidates to generate
+        :return: the parsed candidates, candidates that are no valid test2code structure are dropped
+        """
+        self.logger.info(f"Generating {candidates} candidate implementations using {self.model}. Testcases length: {len(testcases)}")
+        self.model_calls += 1
+        with self.provider.track():
+            completion = await self.client.chat.completions.create(
+                model=self.model_name,
+                messages=self._generation_messages(testcases),
+                n=candidates,
+                **self._request_options()
+            )
+        self.last_usage = self._usage(completion.usage)
+        self.logger.info(f"Received candidates from {self.model}")
+        parsed_results = []
+        for choice in completion.choices:
+            try:
+                parsed_results.append(parse_response(choice.message.content, self.logger))
+            except ValueError as e:
+                self.logger.error(f"Dropping candidate {choice.index}: {str(e)}")
+        if not parsed_results:
+            raise ValueError("None of the generated candidates is a valid test2code structure")
+        return parsed_results
+
+    async def revise_implementation(self, testcases: str, generated_methods: str, error_message: str, on_token=None):
+        """
+        Revise the implementation of the given testcases
+        :param testcases: the testcases to fix, all or only the failing units
+        :param generated_methods: the current implementation of these testcases, only sent without a conversation
+        :param error_message: the test run output or error to fix
+        :param on_token: optional coroutine function called with every generated token
+        :return: the revised units
+        """
+        self.escalate()
+        if self.conversation is not None:
+            # The implementation is in the earlier answers of the conversation, the new turn only names
+            # the testcases to fix and the error
+            self.logger.info(f"Revising implementation using {self.model}, continuing a conversation of {len(self.conversation)} messages")
+            messages = self.conversation + [
+                {"role": "user", "content": REVISE_TURN_PROMPT + "Testcase: " + testcases +
+                                            " ErrorMessage: " + error_message}
+            ]
+        else:
+            self.logger.info(f"Revising implementation using {self.model}")
+            messages = [
                 {"role": "system", "content": SYSTEM_PROMPT_REVISE},
                 {"role": "user", "content": "Testcase: " + testcases +
                                                 " Implementation: " + generated_methods +
                                                 " ErrorMessage: " + error_message}
             ]
-        )
-        self.logger.info("Received revised implementation from OpenAI")
-        parsed_result = json.loads(completion.choices[0].message.content)
+        content = await self._complete(messages, on_token)
+        self.logger.info(f"Received revised implementation from {self.model}, {(self.last_usage or {}).get('cached_tokens', 0)} prompt tokens cached")
+        parsed_result = parse_response(content, self.logger)
+        if self.conversation is not None:
+            self.conversation = messages + [{"role": "assistant", "content": json.dumps(parsed_result)}]
         return parsed_result
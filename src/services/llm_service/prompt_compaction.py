@@ -0,0 +1,102 @@
+# prompt_compaction.py
+
+import re
+from collections import OrderedDict
+from typing import List, Tuple
+
+# Distinct failures sent to the LLM, the names of the other failing tests are listed without details
+MAX_FAILURES = 8
+MAX_ERROR_LINES = 6
+
+PYTEST_FRAME_PATTERN = re.compile(r'^\S+:\d+: in (\S+)$')
+# JUnit stack frames of the test framework, the JDK and Maven say nothing about the implementation
+FRAMEWORK_FRAME_PATTERN = re.compile(
+    r'^\s*at (org\.junit|org\.opentest4j|org\.apache\.maven|java\.base/|java\.lang\.reflect|jdk\.internal|sun\.reflect)'
+)
+
+
+def compact_traceback(longrepr: str) -> Tuple[str, str]:
+    """
+    Trim a failure report to the lines that locate and explain the failure
+    :param longrepr: The failure report of pytest or JUnit
+    :return: Tuple of the compacted report and the error part of it, which identifies repeated failures
+    """
+    lines = (longrepr or "").strip().splitlines()
+    if not lines:
+        return "", ""
+
+    if any(line.startswith("E ") for line in lines):
+        # pytest: keep the failing source lines, the called functions and the error lines
+        kept, errors = [], []
+        frame = None
+        for line in lines:
+            frame_match = PYTEST_FRAME_PATTERN.match(line)
+            if frame_match:
+                frame = frame_match.group(1)
+            elif line.startswith("E "):
+                if len(errors) < MAX_ERROR_LINES:
+                    errors.append(f"E {line[1:].strip()}")
+            elif line.startswith(">"):
+                kept.append(f"> {line[1:].strip()}")
+            elif frame is not None and line.strip() and not set(line.strip()) <= {"^", "~"}:
+                # First source line after a frame header is the call into the next function
+                kept.append(f"in {frame}: {line.strip()}")
+                frame = None
+        return "\n".join(kept + errors), "\n".join(errors)
+
+    # JUnit: the exception message, then only the frames outside of the test framework and the JDK
+    frames = [line.strip() for line in lines[1:] if line.strip().startswith("at ") and not FRAMEWORK_FRAME_PATTERN.match(line)]
+    return "\n".join([lines[0].strip()] + frames[:MAX_ERROR_LINES]), lines[0].strip()
+
+
+def compact_failures(failures: List[Tuple[str, str]]) -> str:
+    """
+    Build the error message of a revision from the failing tests: reports are trimmed and tests failing
+    with the same error are reported once
+    :param failures: Tuples of test name and failure report
+    :return: The error message
+    """
+    groups: "OrderedDict[str, dict]" = OrderedDict()
+    for name, longrepr in failures:
+        compacted, error = compact_traceback(longrepr)
+        group = groups.setdefault(error or compacted, {"report": compacted, "tests": []})
+        group["tests"].append(name)
+
+    messages = []
+    for group in list(groups.values())[:MAX_FAILURES]:
+        same = f" (same error in {', '.join(group['tests'][1:])})" if len(group["tests"]) > 1 else ""
+        messages.append(f"Test {group['tests'][0]}{same}:\n{group['report']}")
+    remaining = [name for group in list(groups.values())[MAX_FAILURES:] for name in group["tests"]]
+    if remaining:
+        messages.append(f"Also failing: {', '.join(remaining)}")
+    return "\n\n".join(messages)
+
+
+def select_units(units: List[dict], test_names: List[str]) -> List[int]:
+    """
+    Get the indices of the test2code units whose testcases contain one of the tests
+    :param units: The test2code units of the LLM response
+    :param test_names: Names of the failing test functions
+    :return: The indices, empty if a test is in none of the units
+    """
+    indices = []
+    for name in test_names:
+        pattern = re.compile(rf'\b{re.escape(name)}\s*\(')
+        matching = [index for index, unit in enumerate(units) if pattern.search(unit.get("testcase", ""))]
+        if not matching:
+            return []
+        indices.extend(index for index in matching if index not in indices)
+    return sorted(indices)
+
+
+def merge_units(units: List[dict], indices: List[int], revised_units: List[dict]) -> List[dict]:
+    """
+    Replace the revised units, the revised units take the place of the first one sent for revision
+    """
+    merged = []
+    for index, unit in enumerate(units):
+        if index == indices[0]:
+            merged.extend(revised_units)
+        elif index not in indices:
+            merged.append(unit)
+    return merged
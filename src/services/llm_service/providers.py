@@ -0,0 +1,188 @@
+# providers.py
+
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from .llm_client import LLMClientProvider, llm_clients, local_llm_clients
+from .response_schema import get_response_format
+
+
+class LLMProvider:
+    """
+    A backend answering chat completions through the interface of the OpenAI client
+    """
+
+    def __init__(self, name: str, clients: Optional[LLMClientProvider], response_format: Optional[str] = None):
+        """
+        :param clients: Client provider of the backend, None for providers that bring their own client
+        :param response_format: See get_response_format, LLM_RESPONSE_FORMAT without it
+        """
+        self.name = name
+        self.clients = clients
+        self.response_format = get_response_format(response_format)
+
+    def get_client(self):
+        return self.clients.get()
+
+    def track(self):
+        return self.clients.track()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.clients.stats()
+
+
+class MockCompletions:
+    """
+    Deterministic offline answers: the test2code units of the responses file whose testcases appear in the
+    last message. Testcases without a unit are answered with a noValidCode error.
+    """
+
+    def __init__(self, units: List[dict]):
+        self.units = units
+
+    def answer(self, messages: list) -> str:
+        prompt = messages[-1]["content"]
+        matching = [unit for unit in self.units if unit["testcase"] in prompt]
+        if not matching:
+            return json.dumps({"test2code": [], "error": {
+                "source": "implementation", "type": "noValidCode", "message": "No mock implementation for these testcases"
+            }})
+        return json.dumps({"test2code": matching, "error": {"source": "", "type": "", "message": ""}})
+
+    async def create(self, model: str, messages: list, stream: bool = False, n: int = 1, **kwargs):
+        content = self.answer(messages)
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex}"
+        usage = {"prompt_tokens": sum(len(message["content"]) // 4 for message in messages),
+                 "completion_tokens": len(content) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"] * n
+        if not stream:
+            return ChatCompletion.model_validate({
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": index, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                            for index in range(n)],
+                "usage": usage,
+            })
+
+        async def chunks():
+            yield ChatCompletionChunk.model_validate({
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": "stop"}],
+            })
+            yield ChatCompletionChunk.model_validate({
+                "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [], "usage": usage,
+            })
+
+        return chunks()
+
+
+class MockClient:
+    def __init__(self, units: List[dict]):
+        self.chat = type("Chat", (), {"completions": MockCompletions(units)})()
+
+
+class MockProvider(LLMProvider):
+    """
+    Offline provider for development and tests, it makes no requests at all
+    """
+
+    def __init__(self, responses_file: Optional[str] = None):
+        # The canned answers follow the test2code structure on their own, no output constraint is sent
+        super().__init__("mock", None, "none")
+        units = []
+        if responses_file:
+            with open(responses_file) as file:
+                units = json.load(file)
+        self.client = MockClient(units)
+        self.requests = 0
+
+    def get_client(self):
+        return self.client
+
+    @contextmanager
+    def track(self):
+        self.requests += 1
+        yield
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": self.requests, "units": len(self.client.chat.completions.units)}
+
+
+class LLMRouter:
+    """
+    Selects the provider and the model of the LLM calls. Models are named <provider>:<model>, e.g.
+    openai:gpt-4o or local:qwen2.5-coder-7b; a name without a configured provider before its first colon is an
+    OpenAI model, e.g. the fine-tuned ft:gpt-4o-mini:org::id.
+    With a small model configured, a job starts on the small model and escalates to the default model
+    once the small model used up its attempts, so easy suites finish on the fast model.
+    """
+
+    def __init__(self):
+        self.providers: Dict[str, LLMProvider] = {}
+        self.default_model = "openai:gpt-4o"
+        self.small_model = None
+        self.small_model_attempts = 1
+        self.allowed_models: List[str] = []
+
+    def configure_from_env(self):
+        """
+        Read LLM_MODEL, LLM_SMALL_MODEL, LLM_SMALL_MODEL_ATTEMPTS and LLM_ALLOWED_MODELS. The local provider is
+        available with LOCAL_LLM_BASE_URL, the mock provider with LLM_MOCK_ENABLED=true.
+        """
+        self.providers = {"openai": LLMProvider("openai", llm_clients)}
+        if os.getenv("LOCAL_LLM_BASE_URL"):
+            # Local servers rarely support strict JSON schemas, JSON mode is the safe default
+            self.providers["local"] = LLMProvider(
+                "local", local_llm_clients, os.getenv("LOCAL_LLM_RESPONSE_FORMAT", "json_object")
+            )
+        if os.getenv("LLM_MOCK_ENABLED", "false").lower() == "true":
+            self.providers["mock"] = MockProvider(os.getenv("LLM_MOCK_RESPONSES_FILE"))
+        self.default_model = os.getenv("LLM_MODEL", self.default_model)
+        self.small_model = os.getenv("LLM_SMALL_MODEL") or None
+        self.small_model_attempts = int(os.getenv("LLM_SMALL_MODEL_ATTEMPTS", str(self.small_model_attempts)))
+        self.allowed_models = [model.strip() for model in os.getenv("LLM_ALLOWED_MODELS", "").split(",") if model.strip()]
+
+    def resolve(self, model: str) -> Tuple[LLMProvider, str]:
+        """
+        Get the provider and the model name of a model
+        """
+        if not self.providers:
+            self.configure_from_env()
+        provider_name, _, model_name = model.partition(":")
+        if ":" not in model or provider_name not in self.providers:
+            # Model names may contain colons themselves, only a configured provider name is split off
+            provider_name, model_name = "openai", model
+        if provider_name == "mock" and not model_name:
+            model_name = "mock"
+        return self.providers[provider_name], model_name
+
+    def get_models(self, model: str = None) -> List[str]:
+        """
+        Get the models of a job in the order they are used
+        :param model: Model requested for the job, it is used for every call
+        :raises ValueError: If the requested model is not allowed
+        """
+        if model:
+            if self.allowed_models and model not in self.allowed_models:
+                raise ValueError(f"Model '{model}' is not allowed")
+            return [model]
+        if self.small_model:
+            return [self.small_model, self.default_model]
+        return [self.default_model]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default_model": self.default_model,
+            "small_model": self.small_model,
+            "small_model_attempts": self.small_model_attempts,
+            "providers": {name: provider.stats() for name, provider in self.providers.items()},
+        }
+
+
+llm_router = LLMRouter()
@@ -0,0 +1,169 @@
+# response_schema.py
+
+import json
+import os
+import re
+from typing import List
+
+from pydantic import BaseModel, ValidationError
+
+ERROR_SOURCES = ["", "testcases", "implementation"]
+ERROR_TYPES = ["", "logicError", "syntaxError", "dependencyError", "noValidCode", "unknownError"]
+
+# Strict JSON schema of the answers, the model can only produce output of this structure
+TEST2CODE_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "test2code": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "testcase": {"type": "string"},
+                    "implementation": {"type": "string"},
+                },
+                "required": ["testcase", "implementation"],
+                "additionalProperties": False,
+            },
+        },
+        "error": {
+            "type": "object",
+            "properties": {
+                "source": {"type": "string", "enum": ERROR_SOURCES},
+                "type": {"type": "string", "enum": ERROR_TYPES},
+                "message": {"type": "string"},
+            },
+            "required": ["source", "type", "message"],
+            "additionalProperties": False,
+        },
+    },
+    "required": ["test2code", "error"],
+    "additionalProperties": False,
+}
+
+
+class Test2CodeUnit(BaseModel):
+    testcase: str
+    implementation: str
+
+
+class GenerationError(BaseModel):
+    # Not restricted to the enums of the schema, the test runs set their own source and type
+    source: str = ""
+    type: str = ""
+    message: str = ""
+
+
+class Test2CodeResponse(BaseModel):
+    test2code: List[Test2CodeUnit]
+    error: GenerationError = GenerationError()
+
+
+def get_response_format(response_format: str = None):
+    """
+    Get the response_format of the completion requests:
+    json_schema (constrained to the schema), json_object (any JSON) or none
+    :param response_format: One of these names, LLM_RESPONSE_FORMAT without it
+    """
+    response_format = (response_format or os.getenv("LLM_RESPONSE_FORMAT", "json_schema")).lower()
+    if response_format == "json_schema":
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": "test2code", "strict": True, "schema": TEST2CODE_JSON_SCHEMA},
+        }
+    if response_format == "json_object":
+        return {"type": "json_object"}
+    return None
+
+
+def repair_json(content: str) -> str:
+    """
+    Fix the usual near-misses of model output: markdown code fences, text around the object,
+    trailing commas and brackets left open by a cut-off answer
+    """
+    content = re.sub(r'^\s*```(?:json)?\s*|\s*```\s*$', '', content.strip())
+    start = content.find("{")
+    if start > 0:
+        content = content[start:]
+
+    # Drop trailing commas and close the strings and brackets that are still open at the end.
+    # Only characters outside of strings count, the generated code in the strings stays as it is.
+    chars = []
+    stack = []
+    in_string = False
+    escaped = False
+    # Start of the escape sequence in chars and the hex digits a \u escape still needs
+    escape_start = None
+    unicode_digits = 0
+    trailing_comma = None
+    for char in content:
+        if in_string:
+            if unicode_digits:
+                unicode_digits -= 1
+                if not unicode_digits:
+                    escape_start = None
+            elif escaped:
+                escaped = False
+                if char == "u":
+                    unicode_digits = 4
+                else:
+                    escape_start = None
+            elif char == "\\":
+                escaped = True
+                escape_start = len(chars)
+            elif char == '"':
+                in_string = False
+            chars.append(char)
+            continue
+        if char in "}]" and trailing_comma is not None:
+            del chars[trailing_comma]
+        if char == ",":
+            trailing_comma = len(chars)
+        elif not char.isspace():
+            trailing_comma = None
+        chars.append(char)
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return "".join(chars)
+    if stack:
+        if trailing_comma is not None:
+            del chars[trailing_comma]
+        if in_string and escape_start is not None:
+            # The answer was cut off inside an escape sequence, a quote after it would be escaped or invalid
+            del chars[escape_start:]
+        return "".join(chars) + ('"' if in_string else "") + "".join(reversed(stack))
+    return "".join(chars)
+
+
+def parse_response(content: str, logger=None) -> dict:
+    """
+    Parse and validate an answer of the model, near-miss JSON is repaired locally
+    :param content: The content of the answer
+    :param logger: Logger for repairs
+    :return: The answer as a dict with test2code and error
+    :raises ValueError: If the answer is no valid test2code structure, even after the repair
+    """
+    try:
+        # strict=False accepts raw newlines in strings, which models often emit in code
+        data = json.loads(content, strict=False)
+    except json.JSONDecodeError as e:
+        try:
+            data = json.loads(repair_json(content), strict=False)
+        except json.JSONDecodeError:
+            raise ValueError(f"LLM response is no valid JSON: {str(e)}")
+        if logger is not None:
+            logger.info(f"Repaired invalid JSON in LLM response: {str(e)}")
+
+    if isinstance(data, dict) and isinstance(data.get("test2code"), dict):
+        # A single unit instead of a list of units
+        data["test2code"] = [data["test2code"]]
+    try:
+        return Test2CodeResponse.model_validate(data).model_dump()
+    except ValidationError as e:
+        raise ValueError(f"LLM response does not match the test2code structure: {str(e)}")
@@ -0,0 +1,12 @@
+# __init__.py
+
+from .logging_setup import JSONFormatter, RequestIDFormatter, configure_logging
+from .tracing import SPAN_LOGGER, OTLPSpanFormatter, Tracer, tracer
+
+__all__ = ['JSONFormatter',
+           'RequestIDFormatter',
+           'configure_logging',
+           'SPAN_LOGGER',
+           'OTLPSpanFormatter',
+           'Tracer',
+           'tracer']
@@ -0,0 +1,121 @@
+# logging_setup.py
+
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from datetime import datetime, timezone
+
+from .tracing import SPAN_LOGGER, OTLPSpanFormatter, tracer
+
+# Attributes every log record has, the other attributes were passed as extra and end up in the JSON output
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class RequestIDFormatter(logging.Formatter):
+    """
+    Text formatter that handles records without a request id
+    """
+
+    def format(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = 'N/A'
+        return super(RequestIDFormatter, self).format(record)
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line
+    """
+
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Records from the queue carry the formatted traceback, see ExceptionQueueHandler
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class ExceptionQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that keeps the traceback apart from the message. The default handler formats the
+    traceback into the message and drops exc_info, the formatters behind the queue then cannot tell them apart.
+    """
+
+    def prepare(self, record):
+        # Merge the arguments and format the traceback now, the record is handled on another thread
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SpanFilter(logging.Filter):
+    """
+    Passes either only the span records or everything but them
+    """
+
+    def __init__(self, spans: bool):
+        super().__init__()
+        self.spans = spans
+
+    def filter(self, record):
+        return (record.name == SPAN_LOGGER) == self.spans
+
+
+def configure_logging(log_file: str) -> logging.handlers.QueueListener:
+    """
+    Route the records of the root logger through a queue to rotating file handlers that write on a
+    background thread, so logging never blocks the event loop on disk I/O.
+    Reads LOG_FORMAT (json or text), LOG_MAX_BYTES, LOG_BACKUP_COUNT and TRACE_EXPORT_PATH.
+    :param log_file: Path of the log file
+    :return: The started listener, stop it on shutdown to flush the queue
+    """
+    max_bytes = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    backup_count = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+
+    file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.setLevel(logging.INFO)
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        file_handler.setFormatter(RequestIDFormatter(
+            '%(asctime)s - %(levelname)s - [Request ID: %(request_id)s] - %(message)s'
+        ))
+    else:
+        file_handler.setFormatter(JSONFormatter())
+    file_handler.addFilter(SpanFilter(spans=False))
+    handlers = [file_handler]
+
+    tracer.configure_from_env()
+    if tracer.enabled:
+        span_handler = logging.handlers.RotatingFileHandler(
+            os.getenv("TRACE_EXPORT_PATH"), maxBytes=max_bytes, backupCount=backup_count
+        )
+        span_handler.setFormatter(OTLPSpanFormatter())
+        span_handler.addFilter(SpanFilter(spans=True))
+        handlers.append(span_handler)
+
+    log_queue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(ExceptionQueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,122 @@
+# tracing.py
+
+import contextvars
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict
+
+SPAN_LOGGER = "test2code.spans"
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPSpanFormatter(logging.Formatter):
+    """
+    Formats span records as one OTLP/JSON ExportTraceServiceRequest per line,
+    the format of the OpenTelemetry collector's file exporter
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        span = record.span
+        otlp_span = {
+            "traceId": span["trace_id"],
+            "spanId": span["span_id"],
+            "name": span["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(span["start_time_ns"]),
+            "endTimeUnixNano": str(span["end_time_ns"]),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span["attributes"].items()],
+            "status": {"code": 2, "message": span["error"]} if span["error"] else {"code": 1},
+        }
+        if span["parent_span_id"]:
+            otlp_span["parentSpanId"] = span["parent_span_id"]
+        return json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "test2code-backend"}}]},
+                "scopeSpans": [{"scope": {"name": "test2code"}, "spans": [otlp_span]}],
+            }]
+        })
+
+
+class Tracer:
+    """
+    Lightweight spans carried by the request id: the trace id of a request is its request id.
+    Finished spans are logged to the span logger, which the logging pipeline writes to the trace file
+    on its background thread. Spans are only recorded when a trace file is configured.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.logger = logging.getLogger(SPAN_LOGGER)
+
+    def configure_from_env(self):
+        self.enabled = bool(os.getenv("TRACE_EXPORT_PATH"))
+
+    @staticmethod
+    def start_trace(request_id: str = None):
+        """
+        Start the trace of a request in the current context, following spans become part of it
+        :param request_id: The request id (a UUID), a new trace id is generated without it
+        """
+        try:
+            trace_id = uuid.UUID(request_id).hex
+        except (TypeError, ValueError):
+            trace_id = uuid.uuid4().hex
+        _trace_id.set(trace_id)
+        _current_span.set(None)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Record a span around the block, nested spans become its children
+        :param name: Name of the span, e.g. generate, build, run, parse or revise
+        :param attributes: Attributes of the span, e.g. language and version
+        """
+        if not self.enabled:
+            yield
+            return
+
+        trace_id = _trace_id.get()
+        if trace_id is None:
+            trace_id = uuid.uuid4().hex
+            _trace_id.set(trace_id)
+        span_id = os.urandom(8).hex()
+        parent_span_id = _current_span.get()
+        token = _current_span.set(span_id)
+        start_time_ns = time.time_ns()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            raise
+        finally:
+            _current_span.reset(token)
+            self.logger.info(name, extra={"span": {
+                "trace_id": trace_id,
+                "span_id": span_id,
+                "parent_span_id": parent_span_id,
+                "name": name,
+                "start_time_ns": start_time_ns,
+                "end_time_ns": time.time_ns(),
+                "attributes": attributes,
+                "error": error,
+            }})
+
+
+tracer = Tracer()
@@ -0,0 +1,27 @@
+# __init__.py
+
+from .metrics import (
+    CONTENT_TYPE_LATEST,
+    observe_attempts,
+    observe_cache,
+    observe_container_run,
+    observe_http_request,
+    observe_image_build,
+    observe_llm_call,
+    observe_sandbox_kill,
+    render_metrics,
+    set_active_runs,
+    set_job_queue_depth,
+)
+
+__all__ = ['CONTENT_TYPE_LATEST',
+           'observe_attempts',
+           'observe_cache',
+           'observe_container_run',
+           'observe_http_request',
+           'observe_image_build',
+           'observe_llm_call',
+           'observe_sandbox_kill',
+           'render_metrics',
+           'set_active_runs',
+           'set_job_queue_depth']
@@ -0,0 +1,108 @@
+# metrics.py
+
+from typing import Any, Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+registry = CollectorRegistry()
+
+HTTP_REQUEST_DURATION = Histogram(
+    "test2code_http_request_duration_seconds", "Duration of HTTP requests",
+    ["method", "route", "status"], registry=registry,
+)
+LLM_DURATION = Histogram(
+    "test2code_llm_duration_seconds", "Duration of LLM calls",
+    ["stage", "language", "version", "model"], registry=registry,
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, float("inf")),
+)
+LLM_TOKENS = Histogram(
+    "test2code_llm_tokens", "Tokens of an LLM call",
+    ["stage", "kind", "language", "version", "model"], registry=registry,
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, float("inf")),
+)
+CONTAINER_STAGE_DURATION = Histogram(
+    "test2code_container_stage_duration_seconds",
+    "Duration of the stages of a test run (build, run, extract) and of runner image builds (image_build)",
+    ["stage", "language", "version"], registry=registry,
+    # Runner image builds download the toolchain and the test dependencies, they take minutes
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, float("inf")),
+)
+ATTEMPTS = Histogram(
+    "test2code_attempts_per_request", "Test attempts until a request finished",
+    ["outcome", "language", "version"], registry=registry,
+    buckets=(1, 2, 3, 4, 5, float("inf")),
+)
+CACHE_REQUESTS = Counter(
+    "test2code_cache_requests", "Cache lookups",
+    ["cache", "result", "language", "version"], registry=registry,
+)
+SANDBOX_KILLS = Counter(
+    "test2code_sandbox_kills", "Test runs killed by the sandbox",
+    ["reason", "language"], registry=registry,
+)
+JOB_QUEUE_DEPTH = Gauge("test2code_job_queue_depth", "Jobs waiting for a worker", registry=registry)
+ACTIVE_RUNS = Gauge("test2code_active_runs", "Test runs executing", registry=registry)
+
+STAGE_TIMES = {"build": "build_time", "run": "run_time", "extract": "extract_time"}
+
+
+def observe_http_request(method: str, route: str, status: int, duration: float):
+    HTTP_REQUEST_DURATION.labels(method, route, str(status)).observe(duration)
+
+
+def observe_llm_call(stage: str, language: str, version: str, duration: float, usage: Optional[Dict[str, int]],
+                     model: str = ""):
+    """
+    Record the latency and token usage of an LLM call
+    :param stage: generate, candidates or revise
+    :param duration: Duration in seconds
+    :param usage: prompt_tokens, completion_tokens and cached_tokens of the call, None when the API did not report them
+    :param model: Model of the call as <provider>:<model>
+    """
+    LLM_DURATION.labels(stage, language, version, model).observe(duration)
+    for kind in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+        if usage and usage.get(kind) is not None:
+            LLM_TOKENS.labels(stage, kind.removesuffix("_tokens"), language, version, model).observe(usage[kind])
+
+
+def observe_container_run(language: str, version: str, result: Dict[str, Any]):
+    """
+    Record the stage durations of a test run, the result holds them in milliseconds
+    """
+    for stage, key in STAGE_TIMES.items():
+        if result.get(key) is not None:
+            CONTAINER_STAGE_DURATION.labels(stage, language, version).observe(result[key] / 1000)
+
+
+def observe_image_build(language: str, version: str, duration: float):
+    """
+    Record the duration of a runner image build in seconds, the first run of a runtime waits for it
+    """
+    CONTAINER_STAGE_DURATION.labels("image_build", language, version).observe(duration)
+
+
+def observe_attempts(language: str, version: str, attempts: int, passed: bool):
+    ATTEMPTS.labels("passed" if passed else "failed", language, version).observe(attempts)
+
+
+def observe_cache(cache: str, hit: bool, language: str, version: str):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss", language, version).inc()
+
+
+def observe_sandbox_kill(reason: str, language: str):
+    SANDBOX_KILLS.labels(reason, language).inc()
+
+
+def set_job_queue_depth(depth: int):
+    JOB_QUEUE_DEPTH.set(depth)
+
+
+def set_active_runs(active_runs: int):
+    ACTIVE_RUNS.set(active_runs)
+
+
+def render_metrics() -> bytes:
+    """
+    Render all metrics in the Prometheus text format
+    """
+    return generate_latest(registry)
@@ -0,0 +1,7 @@
+# conftest.py
+
+import os
+import sys
+
+# The application imports its modules relative to src, e.g. services.container_service
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
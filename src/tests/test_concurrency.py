@@ -0,0 +1,167 @@
+# test_concurrency.py
+
+import asyncio
+import io
+import json
+import re
+import tarfile
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services.container_service import base
+from services.container_service.archive import create_tar_archive
+from services.container_service.concurrency import ConcurrencyLimiter
+from services.container_service.executor import run_in_container_executor
+from services.container_service.python_service import PythonContainerService
+from services.container_service.sandbox import sandbox_scheduler
+
+PYTHON_CODE = "def run_id():\n    return {run}\n"
+PYTHON_TEST = "def test_run_{run}():\n    assert run_id() == {run}\n"
+
+
+class RunTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = 0
+        self.peak_running = 0
+        self.names = []
+
+    def enter(self):
+        with self._lock:
+            self.running += 1
+            self.peak_running = max(self.peak_running, self.running)
+
+    def exit(self):
+        with self._lock:
+            self.running -= 1
+
+
+class FakeContainer:
+    """
+    Container with its own file system: the test run only sees the files put into this container
+    """
+
+    def __init__(self, tracker: RunTracker, run_seconds: float):
+        self.tracker = tracker
+        self.run_seconds = run_seconds
+        self.files = {}
+        self.attrs = {"State": {"OOMKilled": False}}
+
+    def put_archive(self, path, data):
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            for member in tar:
+                self.files[f"{path}/{member.name}"] = tar.extractfile(member).read().decode()
+
+    def start(self):
+        self.tracker.enter()
+
+    def wait(self, timeout=None):
+        time.sleep(self.run_seconds)
+        sources = [content for path, content in self.files.items() if path.endswith(".py")]
+        tests = []
+        for source in sources:
+            returned = re.search(r"return (\d+)", source).group(1)
+            for test_run in re.findall(r"def test_run_(\d+)", source):
+                tests.append({"nodeid": f"test.py::test_run_{test_run}",
+                              "outcome": "passed" if test_run == returned else "failed",
+                              "setup": {}, "call": {"duration": 0.01}, "teardown": {}})
+        passed = sum(test["outcome"] == "passed" for test in tests)
+        self.files[f"{base.ContainerService.WORKDIR}/test_results.json"] = json.dumps(
+            {"summary": {"passed": passed, "total": len(tests)}, "tests": tests, "sources": len(sources)}
+        )
+        self.tracker.exit()
+
+    def reload(self):
+        pass
+
+    def kill(self):
+        pass
+
+    def get_archive(self, path):
+        return [create_tar_archive({path.rsplit("/", 1)[-1]: self.files[path]})], {}
+
+    def remove(self, force=False):
+        pass
+
+
+@pytest.fixture
+def fake_docker(monkeypatch):
+    tracker = RunTracker()
+
+    def create(name, **kwargs):
+        tracker.names.append(name)
+        return FakeContainer(tracker, tracker.run_seconds)
+
+    tracker.run_seconds = 0.05
+    tracker.docker_client = SimpleNamespace(containers=SimpleNamespace(create=create))
+    monkeypatch.setattr(base.runner_images, "get_image", lambda service: "image")
+    monkeypatch.setattr(base.container_pool, "enabled", False)
+    monkeypatch.setattr(sandbox_scheduler, "tmpfs_mb", 0)
+    # Admission against the host capacity would serialize the runs on small hosts
+    monkeypatch.setattr(sandbox_scheduler, "capacity_cpus", 1000.0)
+    monkeypatch.setattr(sandbox_scheduler, "capacity_memory_mb", 10 ** 7)
+    return tracker
+
+
+def configure_limiter(monkeypatch, max_runs: int, python_runs: int) -> ConcurrencyLimiter:
+    monkeypatch.setenv("MAX_CONCURRENT_RUNS", str(max_runs))
+    monkeypatch.setenv("MAX_CONCURRENT_RUNS_PYTHON", str(python_runs))
+    limiter = ConcurrencyLimiter()
+    limiter.configure_from_env(["python", "java"])
+    monkeypatch.setattr(base, "run_limiter", limiter)
+    return limiter
+
+
+def test_concurrent_runs_are_isolated_and_limited(monkeypatch, fake_docker):
+    limiter = configure_limiter(monkeypatch, max_runs=3, python_runs=2)
+    runs = 12
+    filenames = []
+
+    async def run(run_id):
+        service = PythonContainerService(version="3.11", docker_client=fake_docker.docker_client)
+        get_filename = service.get_filename
+        monkeypatch.setattr(service, "get_filename", lambda: filenames.append(get_filename()) or filenames[-1])
+        return run_id, await service.run_code_in_container_async(
+            PYTHON_CODE.format(run=run_id), PYTHON_TEST.format(run=run_id), use_cache=False
+        )
+
+    async def run_all():
+        return await asyncio.gather(*(run(run_id) for run_id in range(runs)))
+
+    results = asyncio.run(run_all())
+
+    assert len(set(fake_docker.names)) == runs
+    assert len(set(filenames)) == runs
+    for run_id, result in results:
+        # Every run only saw its own test and its own implementation
+        assert [test["name"] for test in result["test_results"]["tests"]] == [f"test.py::test_run_{run_id}"]
+        assert result["test_results"]["summary"] == {"passed": 1, "total": 1}
+    assert fake_docker.peak_running == 2
+    assert limiter.peak_active_runs == 2
+    assert limiter.active_runs == 0
+
+
+def test_waiting_runs_hold_no_executor_threads(monkeypatch, fake_docker):
+    configure_limiter(monkeypatch, max_runs=8, python_runs=1)
+    fake_docker.run_seconds = 0.2
+
+    async def run_all():
+        services = [PythonContainerService(version="3.11", docker_client=fake_docker.docker_client)
+                    for _ in range(12)]
+        runs = [asyncio.create_task(service.run_code_in_container_async(
+            PYTHON_CODE.format(run=run_id), PYTHON_TEST.format(run=run_id), use_cache=False
+        )) for run_id, service in enumerate(services)]
+        await asyncio.sleep(0.05)
+        # More runs wait for the single Python slot than the executor has threads, other work still gets one
+        start_time = time.time()
+        await run_in_container_executor(lambda: None)
+        waited = time.time() - start_time
+        for task in runs:
+            task.cancel()
+        await asyncio.gather(*runs, return_exceptions=True)
+        return waited
+
+    assert asyncio.run(run_all()) < 0.1
@@ -0,0 +1,43 @@
+# test_image_registry.py
+
+import logging
+from types import SimpleNamespace
+
+from docker.errors import ImageNotFound
+
+from services.container_service.image_registry import RunnerImageRegistry
+from services.metrics_service.metrics import registry
+
+
+class FakeImages:
+    def __init__(self):
+        self.builds = 0
+
+    def get(self, tag):
+        raise ImageNotFound(f"{tag} not found")
+
+    def build(self, **kwargs):
+        self.builds += 1
+        return SimpleNamespace(id="sha256:runner"), []
+
+
+def get_image_builds(language: str, version: str) -> float:
+    return registry.get_sample_value(
+        "test2code_container_stage_duration_seconds_count",
+        {"stage": "image_build", "language": language, "version": version},
+    ) or 0
+
+
+def test_image_build_is_recorded_once():
+    images = FakeImages()
+    service = SimpleNamespace(
+        LANGUAGE="python", version="3.9", logger=logging.getLogger(), docker_client=SimpleNamespace(images=images),
+        get_runner_dockerfile_content=lambda: "FROM python:3.9", get_runner_context_files=lambda: {},
+    )
+    builds_before = get_image_builds("python", "3.9")
+    image_registry = RunnerImageRegistry()
+
+    assert image_registry.get_image(service) == "sha256:runner"
+    assert image_registry.get_image(service) == "sha256:runner"
+    assert images.builds == 1
+    assert get_image_builds("python", "3.9") == builds_before + 1
@@ -0,0 +1,39 @@
+# test_local_python_service.py
+
+import logging
+
+import pytest
+
+from services.container_service.local_python_service import LocalPythonService
+
+
+@pytest.fixture
+def local_backend(monkeypatch):
+    monkeypatch.setenv("LOCAL_PYTHON_BACKEND_ENABLED", "true")
+    monkeypatch.delenv("LOCAL_PYTHON_ALLOW_NETWORK", raising=False)
+    monkeypatch.setattr(LocalPythonService, "is_available", classmethod(lambda cls: True))
+    return LocalPythonService.get_local_version()
+
+
+def test_local_backend_requires_network_isolation(monkeypatch, local_backend):
+    monkeypatch.setattr(LocalPythonService, "_network_isolation", [])
+
+    assert not LocalPythonService.supports(local_backend)
+
+    monkeypatch.setenv("LOCAL_PYTHON_ALLOW_NETWORK", "true")
+    assert LocalPythonService.supports(local_backend)
+
+
+def test_local_backend_with_network_isolation(monkeypatch, local_backend):
+    monkeypatch.setattr(LocalPythonService, "_network_isolation", ["unshare", "--net", "--map-root-user"])
+
+    assert LocalPythonService.supports(local_backend)
+
+
+def test_missing_network_isolation_is_logged(monkeypatch, caplog, local_backend):
+    monkeypatch.setattr(LocalPythonService, "_network_isolation", [])
+
+    with caplog.at_level(logging.WARNING):
+        LocalPythonService.check_network_isolation(logging.getLogger())
+
+    assert "run in Docker instead" in caplog.text
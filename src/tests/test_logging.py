@@ -0,0 +1,40 @@
+# test_logging.py
+
+import json
+import logging
+import queue
+
+from services.logging_service import JSONFormatter, RequestIDFormatter
+from services.logging_service.logging_setup import ExceptionQueueHandler
+
+
+def log_through_queue(formatter: logging.Formatter) -> str:
+    log_queue = queue.SimpleQueue()
+    logger = logging.getLogger("test_logging")
+    logger.propagate = False
+    handler = ExceptionQueueHandler(log_queue)
+    logger.addHandler(handler)
+    try:
+        try:
+            raise ValueError("broken")
+        except ValueError:
+            logger.exception("Run %s failed", 3, extra={"request_id": "abc"})
+    finally:
+        logger.removeHandler(handler)
+    return formatter.format(log_queue.get_nowait())
+
+
+def test_json_records_from_the_queue_keep_the_exception_apart():
+    entry = json.loads(log_through_queue(JSONFormatter()))
+
+    assert entry["message"] == "Run 3 failed"
+    assert entry["request_id"] == "abc"
+    assert "ValueError: broken" in entry["exception"]
+    assert "Traceback" not in entry["message"]
+
+
+def test_text_records_from_the_queue_keep_the_traceback():
+    line = log_through_queue(RequestIDFormatter("%(levelname)s - [Request ID: %(request_id)s] - %(message)s"))
+
+    assert line.startswith("ERROR - [Request ID: abc] - Run 3 failed\nTraceback")
+    assert line.endswith("ValueError: broken")
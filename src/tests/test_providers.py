@@ -0,0 +1,62 @@
+# test_providers.py
+
+import asyncio
+import json
+import logging
+
+from services.cache_service.result_cache import ResultCache
+from services.llm_service.llm_service import CodeGenerator
+from services.llm_service.providers import LLMProvider, LLMRouter, MockProvider, llm_router
+
+
+def test_mock_provider_is_initialized_as_provider(tmp_path):
+    responses_file = tmp_path / "responses.json"
+    responses_file.write_text(json.dumps([{"testcase": "def test_one(): assert one() == 1",
+                                           "implementation": "def one(): return 1"}]))
+
+    provider = MockProvider(str(responses_file))
+
+    assert isinstance(provider, LLMProvider)
+    assert provider.name == "mock"
+    assert provider.clients is None
+    assert provider.response_format is None
+
+
+def test_mock_provider_answers_matching_units():
+    provider = MockProvider()
+    provider.client.chat.completions.units = [{"testcase": "def test_one(): pass", "implementation": "x = 1"}]
+
+    with provider.track():
+        completion = asyncio.run(provider.get_client().chat.completions.create(
+            model="mock", messages=[{"role": "user", "content": "Input: def test_one(): pass"}]
+        ))
+
+    assert json.loads(completion.choices[0].message.content)["test2code"][0]["implementation"] == "x = 1"
+    assert provider.stats() == {"requests": 1, "units": 1}
+
+
+def test_router_only_splits_configured_provider_names(monkeypatch):
+    monkeypatch.setenv("LLM_MOCK_ENABLED", "true")
+    monkeypatch.delenv("LOCAL_LLM_BASE_URL", raising=False)
+    router = LLMRouter()
+
+    assert [(provider.name, model) for provider, model in map(router.resolve, [
+        "gpt-4o", "openai:gpt-4o", "mock:", "ft:gpt-4o-mini:org::id", "local:qwen2.5-coder-7b"
+    ])] == [("openai", "gpt-4o"), ("openai", "gpt-4o"), ("mock", "mock"), ("openai", "ft:gpt-4o-mini:org::id"),
+            ("openai", "local:qwen2.5-coder-7b")]
+
+
+def test_result_cache_key_depends_on_the_resolved_models(monkeypatch):
+    providers = {"openai": LLMProvider("openai", None, "none"), "mock": MockProvider()}
+    monkeypatch.setattr(llm_router, "providers", providers)
+    monkeypatch.setattr(llm_router, "small_model", None)
+    monkeypatch.setattr(llm_router, "allowed_models", [])
+    logger = logging.getLogger()
+
+    def get_key(model):
+        code_generator = CodeGenerator(logger, client=object(), model=model)
+        return ResultCache.get_key("def test_a(): assert a()", "python", "3.11", code_generator.model_spec)
+
+    assert get_key("gpt-4o") == get_key("openai:gpt-4o")
+    assert get_key("gpt-4o") != get_key("gpt-4o-mini")
+    assert get_key("gpt-4o") != get_key("mock:")
@@ -0,0 +1,42 @@
+# test_response_schema.py
+
+import json
+
+from services.llm_service.response_schema import parse_response, repair_json
+
+
+def test_repair_removes_trailing_commas_outside_strings():
+    content = '{"test2code": [{"testcase": "def test_x(): pass", "implementation": "x = 1",},], "error": {},}'
+
+    assert json.loads(repair_json(content)) == {
+        "test2code": [{"testcase": "def test_x(): pass", "implementation": "x = 1"}], "error": {}
+    }
+
+
+def test_repair_keeps_trailing_commas_in_strings():
+    content = '{"test2code": [{"testcase": "assert f() == [1,2,]", "implementation": "x = [1,2,]\\ny = {1: 2,}",}]}'
+
+    unit = json.loads(repair_json(content))["test2code"][0]
+
+    assert unit == {"testcase": "assert f() == [1,2,]", "implementation": "x = [1,2,]\ny = {1: 2,}"}
+
+
+def test_repair_closes_cut_off_answer():
+    content = '```json\n{"test2code": [{"testcase": "t", "implementation": "x = [1,'
+
+    assert json.loads(repair_json(content))["test2code"][0]["implementation"] == "x = [1,"
+    assert json.loads(repair_json('{"test2code": [{"testcase": "t"},'))["test2code"] == [{"testcase": "t"}]
+
+
+def test_repair_drops_cut_off_escape_sequence():
+    cut_after_backslash = '{"test2code": [{"testcase": "t", "implementation": "print(\\"a\\n\\'
+    cut_in_unicode_escape = '{"test2code": [{"testcase": "t", "implementation": "s = \\"\\u00e9\\u00'
+
+    assert json.loads(repair_json(cut_after_backslash))["test2code"][0]["implementation"] == 'print("a\n'
+    assert json.loads(repair_json(cut_in_unicode_escape))["test2code"][0]["implementation"] == 's = "\u00e9'
+
+
+def test_parse_response_keeps_code_of_repaired_answer():
+    content = 'Here you go: {"test2code": [{"testcase": "t", "implementation": "x = [1,2,]"},]}'
+
+    assert parse_response(content)["test2code"][0]["implementation"] == "x = [1,2,]"
@@ -0,0 +1,127 @@
+# test_run_candidates.py
+
+import asyncio
+import logging
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from logic import CodeExecutionLogic
+from services.container_service import base
+from services.container_service.cancellation import RunCancellation, RunCancelledError
+from services.container_service.python_service import PythonContainerService
+
+PASSED = {"test_results": {"summary": {"passed": 1, "total": 1}, "tests": []}}
+NO_ERROR = {"source": "", "type": "", "message": ""}
+
+
+def candidate(implementation: str) -> dict:
+    return {"test2code": [{"testcase": "def test_a():\n    assert a()", "implementation": implementation}],
+            "error": dict(NO_ERROR)}
+
+
+class SlowLoserService:
+    """
+    The run of the slow candidate blocks in its thread until it is cancelled, like a running container
+    """
+
+    def __init__(self):
+        self.stopped = threading.Event()
+
+    async def run_code_in_container_async(self, implementations, testcases, use_cache=True, cancellation=None):
+        if "slow" not in implementations:
+            await asyncio.sleep(0.05)
+            return PASSED
+
+        def run():
+            with cancellation.on_cancel(self.stopped.set):
+                self.stopped.wait(10)
+            return {"error": "Test run was cancelled"}
+
+        return await asyncio.to_thread(run)
+
+
+def test_losing_candidate_runs_are_stopped():
+    service = SlowLoserService()
+    candidates = [candidate("def a():\n    return slow()"), candidate("def a():\n    return True")]
+
+    start_time = time.time()
+    winner, result = asyncio.run(CodeExecutionLogic.run_candidates(service, candidates, False, logging.getLogger()))
+
+    assert winner is candidates[1]
+    assert result is PASSED
+    assert service.stopped.wait(1)
+    assert time.time() - start_time < 5
+
+
+def test_cancellation_calls_callbacks_of_running_and_later_runs():
+    cancellation = RunCancellation()
+    calls = []
+    with cancellation.on_cancel(lambda: calls.append("running")):
+        cancellation.cancel()
+    with cancellation.on_cancel(lambda: calls.append("later")):
+        pass
+
+    assert calls == ["running", "later"]
+    with pytest.raises(RunCancelledError):
+        cancellation.raise_if_cancelled()
+
+
+def test_cancelled_container_run_kills_its_container(monkeypatch):
+    killed = threading.Event()
+
+    class BlockingExecApi:
+        def exec_create(self, container_id, command, **kwargs):
+            return {"Id": "exec"}
+
+        def exec_start(self, exec_id, **kwargs):
+            # The test command runs until its container is killed
+            killed.wait(10)
+            return b""
+
+        def exec_inspect(self, exec_id):
+            return {"ExitCode": 137, "Running": False}
+
+    container = SimpleNamespace(id="container", client=SimpleNamespace(api=BlockingExecApi()), kill=killed.set,
+                                start=lambda: None, remove=lambda force=False: None)
+    docker_client = SimpleNamespace(containers=SimpleNamespace(create=lambda **kwargs: container))
+    service = PythonContainerService(docker_client=docker_client)
+    monkeypatch.setattr(base.runner_images, "get_image", lambda service: "image")
+    monkeypatch.setattr(service, "put_source_files", lambda container, files: None)
+    cancellation = RunCancellation()
+    threading.Timer(0.1, cancellation.cancel).start()
+
+    result = service.run_code_in_workspace_container("def a():\n    return 1", "def test_a():\n    assert a()",
+                                                     cancellation=cancellation)
+
+    assert killed.is_set()
+    assert result == {"error": "Test run was cancelled"}
+
+
+def test_subset_run_without_tests_falls_back_to_the_full_suite():
+    runs = []
+
+    class SubsetService:
+        def get_test_id(self, name):
+            return name
+
+        async def run_code_in_container_async(self, implementations, testcases, use_cache=True, max_failures=None,
+                                              only_tests=None, on_test_result=None):
+            runs.append(only_tests)
+            if only_tests:
+                # pytest omits the counters of outcomes that did not occur
+                return {"test_results": {"summary": {"total": 0}, "tests": []}}
+            return PASSED
+
+    previous_result = {"test_results": {"summary": {"passed": 0, "total": 1},
+                                        "tests": [{"name": "test_old_name", "outcome": "failed"}]}}
+
+    result = asyncio.run(CodeExecutionLogic.run_tests(
+        SubsetService(), "def a():\n    return True", "def test_a():\n    assert a()", previous_result, False, None,
+        logging.getLogger()
+    ))
+
+    assert runs == [["test_old_name"], None]
+    assert result is PASSED
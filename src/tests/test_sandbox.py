@@ -0,0 +1,45 @@
+# test_sandbox.py
+
+import pytest
+
+from services.container_service.java_service import JavaContainerService
+from services.container_service.python_service import PythonContainerService
+from services.container_service.sandbox import SandboxScheduler
+
+
+def test_timeout_command_wraps_list_command():
+    scheduler = SandboxScheduler(run_timeout=60)
+    command = PythonContainerService(docker_client=object()).get_run_command("test_abc")
+
+    assert scheduler.get_timeout_command("python", command) == ["timeout", "-s", "KILL", "60"] + command
+
+
+def test_timeout_command_splits_str_command():
+    scheduler = SandboxScheduler(run_timeout=60)
+    command = JavaContainerService(docker_client=object()).get_run_command("TestAbc", max_failures=2)
+    assert isinstance(command, str)
+
+    assert scheduler.get_timeout_command("java", command) == [
+        "timeout", "-s", "KILL", "60", "mvn", "-o", "-B", f"-Dmaven.repo.local={JavaContainerService.MAVEN_REPOSITORY}",
+        "-Dsurefire.skipAfterFailureCount=2", "test",
+    ]
+
+
+def test_timeout_command_keeps_fractional_timeout():
+    scheduler = SandboxScheduler(run_timeout=0.5)
+
+    assert scheduler.get_timeout_command("python", ["pytest"])[:4] == ["timeout", "-s", "KILL", "0.5"]
+
+
+def test_configure_rejects_zero_run_timeout(monkeypatch):
+    monkeypatch.setenv("SANDBOX_RUN_TIMEOUT_JAVA", "0")
+
+    with pytest.raises(ValueError):
+        SandboxScheduler().configure_from_env(["python", "java"])
+
+
+def test_out_of_memory_error_names_the_memory_limit():
+    error = PythonContainerService(docker_client=object()).get_out_of_memory_error()
+
+    assert isinstance(error, MemoryError)
+    assert "memory limit" in str(error)
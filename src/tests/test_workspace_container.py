@@ -0,0 +1,83 @@
+# test_workspace_container.py
+
+from types import SimpleNamespace
+
+from services.container_service import base
+from services.container_service.java_service import JavaContainerService
+from services.container_service.sandbox import sandbox_scheduler
+
+
+class FakeExecApi:
+    def __init__(self):
+        self.commands = []
+
+    def exec_create(self, container_id, command, **kwargs):
+        self.commands.append(command)
+        return {"Id": str(len(self.commands))}
+
+    def exec_start(self, exec_id, **kwargs):
+        return b""
+
+    def exec_inspect(self, exec_id):
+        return {"ExitCode": 0, "Running": False}
+
+
+class FakeContainer:
+    def __init__(self):
+        self.id = "container"
+        self.client = SimpleNamespace(api=FakeExecApi())
+        self.removed = False
+
+    def start(self):
+        pass
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+def test_java_run_in_tmpfs_workspace_execs_split_maven_command(monkeypatch):
+    container = FakeContainer()
+    docker_client = SimpleNamespace(containers=SimpleNamespace(create=lambda **kwargs: container))
+    service = JavaContainerService(version="17", docker_client=docker_client)
+    monkeypatch.setattr(sandbox_scheduler, "tmpfs_mb", 64)
+    monkeypatch.setattr(base.runner_images, "get_image", lambda service: "image")
+    monkeypatch.setattr(service, "put_source_files", lambda container, files: None)
+    monkeypatch.setattr(service, "collect_test_results", lambda container, filename, test_code: {"summary": {}})
+
+    result = service.execute_code("public static int one() { return 1; }", "@Test\npublic void testOne() {}")
+
+    assert "error" not in result
+    run_command = container.client.api.commands[-1]
+    assert run_command[:4] == ["timeout", "-s", "KILL", f"{sandbox_scheduler.get_run_timeout('java'):g}"]
+    assert run_command[4:7] == ["mvn", "-o", "-B"]
+    assert run_command[-1] == "test"
+    assert container.removed
+
+
+def test_java_runner_context_files_are_read_once(monkeypatch):
+    service = JavaContainerService(version="11", docker_client=object())
+    context_files = service.get_runner_context_files()
+
+    def fail_open(*args, **kwargs):
+        raise AssertionError("context files read again")
+
+    monkeypatch.setattr("builtins.open", fail_open)
+
+    assert service.get_runner_context_files() == context_files
+    assert JavaContainerService(version="11", docker_client=object()).get_runner_context_files() == context_files
+
+
+def test_java_console_runner_streams_tree_lines(monkeypatch):
+    monkeypatch.setenv("JAVA_RUNNER", "console")
+    service = JavaContainerService(version="11", docker_client=object())
+    output = ["╷", "├─ JUnit Jupiter ✘", "│  └─ CalculatorTest ✘", "│     ├─ testAdd() ✔",
+              "│     ├─ testDivide() ✘ expected: <2> but was: <3>", "│     └─ testLater() ↷ disabled",
+              "+-- JUnit Jupiter [X]", "|  '-- CalculatorTest [X]", "|     +-- testAdd() [OK]", "|     '-- testSub() [X]"]
+    results = []
+
+    service.stream_test_progress([("\n".join(output) + "\n").encode()], lambda *result: results.append(result))
+
+    assert results == [("testAdd", "passed"), ("testDivide", "failed"), ("testLater", "skipped"),
+                       ("testAdd", "passed"), ("testSub", "failed")]
+    monkeypatch.setenv("JAVA_RUNNER", "maven")
+    assert JavaContainerService(version="11", docker_client=object()).parse_progress_line("│  ├─ testAdd() ✔") is None